@@ -0,0 +1,17 @@
+import json
+
+from readers import DATASETS
+
+def load_dataset(name):
+    dataset = DATASETS[name]
+    return list(dataset.iter_documents()), list(dataset.iter_queries())
+
+def load_qrels(name):
+    return DATASETS[name].qrels()
+
+def write_json(results, path):
+    if path:
+        with open(path, 'w') as file:
+            json.dump(results, file, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
@@ -0,0 +1,75 @@
+import argparse
+import time
+
+from sklearn.metrics.pairwise import cosine_similarity
+
+import dense
+import functions
+from benchmarks.common import load_dataset, load_qrels, write_json
+from readers import DATASETS
+
+def weighted_vectors(name, source, scheme):
+    if source == "vectors":
+        # NPL's shipped binary term vectors, used as they are
+        return DATASETS[name].read_vectors()
+    documents, queries = load_dataset(name)
+    preprocessor = functions.Preprocessor(DATASETS[name].read_stopwords())
+    sweep = functions.SchemeSweep([preprocessor.tokenize(doc) for doc in documents], [preprocessor.tokenize(query) for query in queries])
+    return sweep.document_vectors(scheme[:3]), sweep.query_vectors(scheme[3:])
+
+def run(name, source, scheme, ranks, n_lists, nprobes, k):
+    qrels = load_qrels(name)
+    doc_vectors, query_vectors = weighted_vectors(name, source, scheme)
+    n_docs = doc_vectors.shape[0]
+
+    # Exact sparse cosine is the baseline every dense number is compared with
+    exact_sparse = cosine_similarity(query_vectors, doc_vectors)
+    sparse_ids = dense.top_k(exact_sparse, k)[0]
+    results = [{"dataset": name, "source": source, "mode": "sparse-exact", "k": k,
+                "map": functions.calculate_map(exact_sparse, qrels), f"map@{k}": functions.calculate_map(exact_sparse, qrels, k=k)}]
+
+    for rank in ranks:
+        projection = dense.LsaProjection(rank)
+        start = time.perf_counter()
+        doc_dense = projection.fit_transform(doc_vectors)
+        fit_seconds = time.perf_counter() - start
+        query_dense = projection.transform(query_vectors)
+
+        start = time.perf_counter()
+        exact_ids, exact_scores = dense.exact_search(doc_dense, query_dense, k)
+        exact_latency = (time.perf_counter() - start) / len(query_dense)
+        dense_scores = query_dense @ doc_dense.T
+        results.append({"dataset": name, "source": source, "mode": "lsa-exact", "rank": projection.svd.n_components, "k": k,
+                        "fit_seconds": fit_seconds, "latency_ms": 1e3 * exact_latency,
+                        "recall_vs_sparse": dense.recall(exact_ids, sparse_ids),
+                        "map": functions.calculate_map(dense_scores, qrels), f"map@{k}": functions.calculate_map(dense_scores, qrels, k=k)})
+
+        start = time.perf_counter()
+        index = dense.IVFIndex(doc_dense, n_lists)
+        build_seconds = time.perf_counter() - start
+        for nprobe in nprobes:
+            start = time.perf_counter()
+            ids, scores = index.search(query_dense, k, nprobe)
+            latency = (time.perf_counter() - start) / len(query_dense)
+            results.append({"dataset": name, "source": source, "mode": "lsa-ivf", "rank": projection.svd.n_components, "k": k,
+                            "lists": index.n_lists, "nprobe": nprobe, "build_seconds": build_seconds, "latency_ms": 1e3 * latency,
+                            "recall_vs_lsa": dense.recall(ids, exact_ids), "recall_vs_sparse": dense.recall(ids, sparse_ids),
+                            f"map@{k}": functions.calculate_map(dense.ranking_scores(ids, scores, n_docs), qrels, k=k)})
+            print(f"{name.upper()} rank {rank} nprobe {nprobe}: {1e3 * latency:.3f} ms/query, "
+                  f"recall {results[-1]['recall_vs_lsa']:.3f} vs LSA, {results[-1]['recall_vs_sparse']:.3f} vs sparse", flush=True)
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recall, latency and MAP of LSA + IVF retrieval against exact sparse cosine")
+    parser.add_argument("--datasets", nargs="+", default=list(DATASETS), choices=list(DATASETS))
+    parser.add_argument("--source", default="tfidf", choices=["tfidf", "vectors"], help="'vectors' uses shipped document/query vectors (NPL only)")
+    parser.add_argument("--scheme", default="ltc.ltc")
+    parser.add_argument("--ranks", nargs="+", type=int, default=[100, 300])
+    parser.add_argument("--lists", type=int, help="IVF cells (default: sqrt of the collection size)")
+    parser.add_argument("--nprobe", nargs="+", type=int, default=[1, 4, 16])
+    parser.add_argument("-k", type=int, default=100)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+    scheme = tuple(args.scheme.replace('.', ''))
+    names = [name for name in args.datasets if args.source == "tfidf" or DATASETS[name].vectors]
+    write_json([row for name in names for row in run(name, args.source, scheme, args.ranks, args.lists, args.nprobe, args.k)], args.output)
@@ -0,0 +1,74 @@
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+import indexing
+from benchmarks.common import write_json
+from readers import DATASETS
+
+def aligned_counts(index):
+    # Live rows in key order and used terms in sorted order, the layout a batch build produces
+    live = np.flatnonzero(index._live[:index.n_docs])
+    rows = live[np.argsort([index.keys[position] for position in live], kind='stable')]
+    used = np.flatnonzero(index.df > 0)
+    used = used[np.argsort([index.terms[term] for term in used], kind='stable')]
+    return index.counts().tocsr()[rows][:, used], [index.terms[term] for term in used]
+
+def write_copies(source, copies, target, mode='w'):
+    # Like pipeline.scaled_copy, but can append, as a collection that grows by whole batches of records would
+    with open(source, 'r') as file:
+        content = file.read()
+    if not content.endswith('\n'):
+        content += '\n'
+    with open(target, mode) as file:
+        file.write(content * copies)
+
+def run(names, stemming, scale):
+    results = []
+    for name in names:
+        dataset = DATASETS[name]
+        source = dataset.path(dataset.documents)
+        with tempfile.TemporaryDirectory() as directory:
+            # The saved index covers scale copies of the collection; one more copy is then appended as the new documents
+            documents_path = os.path.join(directory, os.path.basename(source))
+            index_directory = os.path.join(directory, "index")
+            write_copies(source, scale, documents_path)
+            start = time.perf_counter()
+            initial = indexing.dataset_incremental_index(dataset, stemming, documents_path, index_directory)
+            initial_seconds = time.perf_counter() - start
+            before = initial.n_live
+            write_copies(source, 1, documents_path, mode='a')
+
+            start = time.perf_counter()
+            synced = indexing.dataset_incremental_index(dataset, stemming, documents_path, index_directory)
+            sync_seconds = time.perf_counter() - start
+            start = time.perf_counter()
+            indexing.dataset_incremental_index(dataset, stemming, documents_path, index_directory)
+            reload_seconds = time.perf_counter() - start
+
+            read = lambda: (dataset.reader.iter_documents(documents_path), dataset.iter_queries(), dataset.read_stopwords())
+            start = time.perf_counter()
+            rebuilt = indexing.LazyCollection(read).index(stemming)
+            rebuild_seconds = time.perf_counter() - start
+
+            counts, terms = aligned_counts(synced)
+            identical = terms == list(rebuilt.terms) and counts.shape == rebuilt.doc_counts.shape and (counts != rebuilt.doc_counts).nnz == 0
+            row = {"dataset": name, "stemming": stemming, "documents": synced.n_live, "added": synced.n_live - before,
+                   "initial_seconds": initial_seconds, "sync_seconds": sync_seconds, "reload_seconds": reload_seconds,
+                   "rebuild_seconds": rebuild_seconds, "identical_to_rebuild": bool(identical)}
+            results.append(row)
+            print(f"{name.upper()} - synced {row['added']} new documents in {sync_seconds:.2f}s vs {rebuild_seconds:.2f}s full rebuild "
+                  f"({rebuild_seconds / sync_seconds:.1f}x), unchanged reload {reload_seconds:.3f}s, identical counts: {identical}", flush=True)
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time to sync the saved incremental index after new documents arrive, against a full rebuild")
+    parser.add_argument("--datasets", nargs="+", default=list(DATASETS), choices=list(DATASETS))
+    parser.add_argument("--stemming", action="store_true")
+    parser.add_argument("--scale", type=int, default=10, help="copies of the collection already indexed before one more is appended")
+    parser.add_argument("--output")
+    args = parser.parse_args()
+    write_json(run(args.datasets, args.stemming, args.scale), args.output)
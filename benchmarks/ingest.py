@@ -0,0 +1,45 @@
+import argparse
+import os
+import tempfile
+import time
+
+import indexing
+from benchmarks.common import write_json
+from benchmarks.pipeline import scaled_copy
+from readers import DATASETS
+
+def run(names, workers_list, scales, chunk_size):
+    results = []
+    for name in names:
+        dataset = DATASETS[name]
+        for scale in scales:
+            with tempfile.TemporaryDirectory() as directory:
+                documents_path = scaled_copy(dataset.path(dataset.documents), scale, directory)
+                read = lambda: (dataset.reader.iter_documents(documents_path), dataset.iter_queries(), dataset.read_stopwords())
+                baseline = None
+                for workers in workers_list:
+                    collection = indexing.LazyCollection(read, workers=workers, chunk_size=chunk_size)
+                    start = time.perf_counter()
+                    # Building both indexes includes stemming, which the parallel ingest moves into the workers
+                    collection.index(False)
+                    collection.index(True)
+                    total_seconds = time.perf_counter() - start
+                    stats = collection.ingest_stats
+                    baseline = baseline or total_seconds
+                    row = {"dataset": name, "scale": scale, "workers": workers, "chunk_size": chunk_size, "cpus": os.cpu_count(),
+                           "documents": stats["documents"], "ingest_seconds": stats["seconds"], "docs_per_second": stats["docs_per_second"],
+                           "both_indexes_seconds": total_seconds, "speedup": baseline / total_seconds}
+                    results.append(row)
+                    print(f"{name.upper()} x{scale} {workers} workers - {row['docs_per_second']:.0f} docs/s ingest, "
+                          f"{total_seconds:.2f}s for both stemming modes ({row['speedup']:.2f}x)", flush=True)
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest throughput of chunked parallel preprocessing against worker count")
+    parser.add_argument("--datasets", nargs="+", default=list(DATASETS), choices=list(DATASETS))
+    parser.add_argument("--workers", nargs="+", type=int, default=[1, 2, 4])
+    parser.add_argument("--scales", nargs="+", type=int, default=[1, 10], help="synthetic corpus multipliers")
+    parser.add_argument("--chunk-size", type=int, default=256, help="documents per task sent to a worker")
+    parser.add_argument("--output")
+    args = parser.parse_args()
+    write_json(run(args.datasets, args.workers, args.scales, args.chunk_size), args.output)
@@ -0,0 +1,146 @@
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import resource
+import subprocess
+import tempfile
+import time
+import tracemalloc
+
+from sklearn.metrics.pairwise import cosine_similarity
+
+import functions
+from benchmarks.common import write_json
+from readers import DATASETS
+
+def peak_rss():
+    # ru_maxrss is the process high-water mark, in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+def reset_peak_rss():
+    # Linux lets a process reset its high-water mark to the current RSS; elsewhere the mark only ever grows
+    try:
+        with open("/proc/self/clear_refs", 'w') as file:
+            file.write("5")
+        return True
+    except OSError:
+        return False
+
+def revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def measure(row, stage, fn):
+    # tracemalloc slows interpreted code several times over, so allocations are only traced when asked for
+    if row["allocations"]:
+        tracemalloc.start()
+    reset = reset_peak_rss()
+    before = peak_rss()
+    start = time.perf_counter()
+    result = fn()
+    seconds = time.perf_counter() - start
+    after = peak_rss()
+    # How far the stage pushed the high-water mark, and the stage's own peak where the mark could be reset first
+    row["stages"][stage] = {"seconds": seconds, "peak_rss_growth_bytes": after - before}
+    if reset:
+        row["stages"][stage]["peak_rss_bytes"] = after
+    if row["allocations"]:
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        row["stages"][stage].update({"peak_alloc_bytes": peak, "retained_bytes": current})
+    return result
+
+def scaled_copy(source, scale, directory):
+    # Concatenate the raw file scale times; every reader treats the repeats as further records
+    if scale == 1:
+        return source
+    target = os.path.join(directory, os.path.basename(source))
+    with open(source, 'r') as file:
+        content = file.read()
+    with open(target, 'w') as file:
+        for _ in range(scale):
+            file.write(content)
+            if not content.endswith('\n'):
+                file.write('\n')
+    return target
+
+def run_stages(name, scale, scheme, stemming, allocations):
+    dataset = DATASETS[name]
+    row = {"dataset": name, "scale": scale, "scheme": ''.join(scheme), "stemming": stemming, "allocations": allocations, "stages": {}}
+    with tempfile.TemporaryDirectory() as directory:
+        documents_path = scaled_copy(dataset.path(dataset.documents), scale, directory)
+        measure(row, "read_file", lambda: functions.read_file(documents_path))
+        documents = measure(row, "parse", lambda: list(dataset.reader.iter_documents(documents_path)))
+    queries = list(dataset.iter_queries())
+    stopwords = dataset.read_stopwords()
+    qrels = dataset.qrels()
+    row["documents"] = len(documents)
+
+    documents = measure(row, "preprocess_text", lambda: [functions.preprocess_text(doc, stopwords, stemming=stemming) for doc in documents])
+    queries = [functions.preprocess_text(query, stopwords, stemming=stemming) for query in queries]
+    doc_vectorizer = functions.CustomTfidfVectorizer(tf_method=scheme[0], idf_method=scheme[1], normalization=scheme[2])
+    doc_vectors = measure(row, "fit_transform", lambda: doc_vectorizer.fit_transform(documents))
+    query_vectors = measure(row, "transform", lambda: doc_vectorizer.transform(queries))
+    similarities = measure(row, "cosine_similarity", lambda: cosine_similarity(query_vectors, doc_vectors))
+    measure(row, "calculate_map", lambda: functions.calculate_map(similarities, qrels))
+    return row
+
+def run_isolated(args):
+    # One child process per (dataset, scale) so peak RSS is not inherited from earlier runs
+    with multiprocessing.get_context("spawn").Pool(1) as pool:
+        return pool.apply(run_stages, args)
+
+def scaling_report(results):
+    # Fitted exponent of seconds against corpus size per stage; the largest one is the first to stop scaling
+    report = {}
+    for name in sorted({row["dataset"] for row in results}):
+        rows = sorted((row for row in results if row["dataset"] == name), key=lambda row: row["scale"])
+        if len(rows) < 2:
+            continue
+        first, last = rows[0], rows[-1]
+        exponents = {}
+        for stage in first["stages"]:
+            low, high = first["stages"][stage]["seconds"], last["stages"][stage]["seconds"]
+            if low > 0 and high > 0:
+                exponents[stage] = math.log(high / low) / math.log(last["documents"] / first["documents"])
+        report[name] = {"exponents": exponents, "worst": max(exponents, key=exponents.get) if exponents else None}
+        print(f"{name.upper()} - " + ", ".join(f"{stage} x^{exponent:.2f}" for stage, exponent in exponents.items()))
+    return report
+
+def compare(results, baseline_path, threshold):
+    with open(baseline_path, 'r') as file:
+        baseline = {(row["dataset"], row["scale"]): row for row in json.load(file)["runs"]}
+    for row in results:
+        previous = baseline.get((row["dataset"], row["scale"]))
+        if previous is None:
+            continue
+        for stage, values in row["stages"].items():
+            before = previous["stages"].get(stage, {}).get("seconds")
+            if before and values["seconds"] > before * threshold:
+                print(f"REGRESSION {row['dataset'].upper()} x{row['scale']} {stage}: {before:.3f}s -> {values['seconds']:.3f}s")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-stage wall time and memory of the retrieval pipeline")
+    parser.add_argument("--datasets", nargs="+", default=list(DATASETS), choices=list(DATASETS))
+    parser.add_argument("--scales", nargs="+", type=int, default=[1, 10, 100], help="synthetic corpus multipliers")
+    parser.add_argument("--scheme", default="ntc", help="document and query weighting scheme")
+    parser.add_argument("--stemming", action="store_true")
+    parser.add_argument("--allocations", action="store_true", help="also trace Python allocations per stage (slows every stage down)")
+    parser.add_argument("--baseline", help="earlier JSON output to flag regressions against")
+    parser.add_argument("--threshold", type=float, default=1.2, help="slowdown factor reported as a regression")
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    runs = []
+    for name in args.datasets:
+        for scale in args.scales:
+            row = run_isolated((name, scale, tuple(args.scheme), args.stemming, args.allocations))
+            runs.append(row)
+            print(f"{name.upper()} x{scale} - " + ", ".join(f"{stage} {values['seconds']:.3f}s" for stage, values in row["stages"].items()), flush=True)
+    if args.baseline:
+        compare(runs, args.baseline, args.threshold)
+    write_json({"revision": revision(), "runs": runs, "scaling": scaling_report(runs)}, args.output)
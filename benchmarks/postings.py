@@ -0,0 +1,74 @@
+import argparse
+import time
+
+import functions
+import postings
+import search
+from benchmarks.common import load_dataset, load_qrels, write_json
+from benchmarks.search import ranking_matrix
+from readers import DATASETS
+
+def raw_nbytes(index):
+    # What the same postings cost as plain CSC: int32 doc ids, float64 weights and the offsets
+    return index.offsets.nbytes + index.doc_ids.nbytes + index.weights.nbytes
+
+def decode_seconds(index):
+    start = time.perf_counter()
+    for term in range(index.n_terms):
+        index.posting(term)
+    return time.perf_counter() - start
+
+def query_seconds(index, query_vectors, k, repeats=5):
+    # Wall time per query of top-k retrieval, which decodes every posting list a query touches; best of several batches
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        index.search_batch(query_vectors, k=k)
+        timings.append(time.perf_counter() - start)
+    return min(timings) / query_vectors.shape[0]
+
+def run(names, scheme, codecs, weight_bits, k):
+    results = []
+    for name in names:
+        documents, queries = load_dataset(name)
+        qrels = load_qrels(name)
+        preprocessor = functions.Preprocessor(DATASETS[name].read_stopwords())
+        sweep = functions.SchemeSweep([preprocessor.tokenize(doc) for doc in documents], [preprocessor.tokenize(query) for query in queries])
+        doc_vectors, query_vectors = sweep.document_vectors(scheme[:3]), sweep.query_vectors(scheme[3:])
+
+        raw = search.InvertedIndex(doc_vectors)
+        n_postings = len(raw.doc_ids)
+        raw_seconds = decode_seconds(raw)
+        raw_query_seconds = query_seconds(raw, query_vectors, k)
+        exact_map = functions.calculate_map(ranking_matrix(raw.search_batch(query_vectors, k=raw.n_docs), (len(queries), raw.n_docs)), qrels)
+        results.append({"dataset": name, "codec": "csr", "bytes": raw_nbytes(raw), "ratio": 1.0, "postings": n_postings,
+                        "decode_postings_per_second": n_postings / raw_seconds, f"query_ms@{k}": raw_query_seconds * 1e3, "map": exact_map})
+        for codec in codecs:
+            for bits in weight_bits:
+                start = time.perf_counter()
+                index = postings.CompressedIndex(doc_vectors, codec, bits)
+                build_seconds = time.perf_counter() - start
+                seconds = decode_seconds(index)
+                per_query = query_seconds(index, query_vectors, k)
+                scores = ranking_matrix(index.search_batch(query_vectors, k=index.n_docs), (len(queries), index.n_docs))
+                row = {"dataset": name, "codec": codec, "weight_bits": bits, "bytes": index.nbytes, "ratio": raw_nbytes(raw) / index.nbytes,
+                       "postings": n_postings, "build_seconds": build_seconds, "decode_postings_per_second": n_postings / seconds,
+                       "decode_slowdown": seconds / raw_seconds, f"query_ms@{k}": per_query * 1e3, "query_slowdown": per_query / raw_query_seconds,
+                       "map": functions.calculate_map(scores, qrels), "map_exact": exact_map}
+                results.append(row)
+                print(f"{name.upper()} {codec}/{bits}-bit - {row['ratio']:.2f}x smaller, "
+                      f"{row['decode_postings_per_second'] / 1e6:.1f}M postings/s ({row['decode_slowdown']:.1f}x CSR), "
+                      f"top-{k} query {per_query * 1e3:.3f} ms vs {raw_query_seconds * 1e3:.3f} ms uncompressed, "
+                      f"MAP {row['map']:.4f} vs {exact_map:.4f}", flush=True)
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compression ratio, decode throughput, query latency and MAP of compressed posting lists against raw CSR")
+    parser.add_argument("--datasets", nargs="+", default=list(DATASETS), choices=list(DATASETS))
+    parser.add_argument("--scheme", default="ntc.ntc", help="document.query weighting scheme, e.g. ltc.nnn")
+    parser.add_argument("--codecs", nargs="+", default=list(postings.CODECS), choices=list(postings.CODECS))
+    parser.add_argument("--weight-bits", nargs="+", type=int, default=[8, 16], choices=[8, 16])
+    parser.add_argument("-k", type=int, default=10, help="depth of the timed top-k queries")
+    parser.add_argument("--output")
+    args = parser.parse_args()
+    write_json(run(args.datasets, tuple(args.scheme.replace('.', '')), args.codecs, args.weight_bits, args.k), args.output)
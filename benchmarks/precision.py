@@ -0,0 +1,65 @@
+import argparse
+
+import numpy as np
+
+import functions
+import indexing
+from benchmarks.common import write_json
+from readers import DATASETS
+
+def unit_nbytes(units):
+    if isinstance(units, functions.Int8Matrix):
+        return units.nbytes
+    return units.data.nbytes + units.indices.nbytes + units.indptr.nbytes
+
+def ranking_fidelity(reference, scores, k):
+    # Mean share of the float64 top-k kept, and share of queries whose top-k comes back in exactly the same order
+    reference_top = functions.rank_documents(reference, k)
+    top = functions.rank_documents(scores, k)
+    overlap = np.mean([len(set(a) & set(b)) / k for a, b in zip(reference_top, top)])
+    return float(overlap), float(np.mean(np.all(reference_top == top, axis=1)))
+
+def run(names, stemming, schemes, precisions, k):
+    results = []
+    for name in names:
+        dataset = DATASETS[name]
+        qrels = dataset.qrels()
+        term_index = indexing.dataset_index(dataset, stemming)
+        sweeps = {precision: term_index.sweep(precision) for precision in ("float64",) + tuple(precisions)}
+        relevance = functions.relevance_matrix(qrels, term_index.query_counts.shape[0], term_index.doc_counts.shape[0])
+        rows = []
+        for scheme in schemes:
+            reference = sweeps["float64"].similarities(scheme[:3], scheme[3:])
+            reference_map = functions.calculate_map(reference, qrels, relevance=relevance)
+            for precision in precisions:
+                sweep = sweeps[precision]
+                scores = sweep.similarities(scheme[:3], scheme[3:])
+                map_score = functions.calculate_map(scores, qrels, relevance=relevance)
+                overlap, same_order = ranking_fidelity(reference, scores, k)
+                doc_units = sweep.document_units(scheme[:3])
+                reference_units = sweeps["float64"].document_units(scheme[:3])
+                rows.append({"dataset": name, "scheme": ''.join(scheme[:3]) + '.' + ''.join(scheme[3:]), "precision": precision,
+                             "map": map_score, "map_float64": reference_map,
+                             # MAP as the sweep reports it, to four decimals
+                             "map_unchanged": bool(round(map_score, 4) == round(reference_map, 4)),
+                             f"top{k}_overlap": overlap, f"top{k}_same_order": same_order,
+                             "doc_bytes_ratio": unit_nbytes(doc_units) / unit_nbytes(reference_units)})
+        for precision in precisions:
+            subset = [row for row in rows if row["precision"] == precision]
+            unchanged = sum(row["map_unchanged"] for row in subset)
+            worst = max(abs(row["map"] - row["map_float64"]) for row in subset)
+            print(f"{name.upper()} {precision} - MAP unchanged for {unchanged}/{len(subset)} schemes, largest change {worst:.5f}, "
+                  f"top-{k} overlap {np.mean([row[f'top{k}_overlap'] for row in subset]):.4f}, "
+                  f"document matrix {np.mean([row['doc_bytes_ratio'] for row in subset]):.2f}x of float64", flush=True)
+        results.extend(rows)
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ranking and MAP fidelity of reduced-precision scoring against float64")
+    parser.add_argument("--datasets", nargs="+", default=list(DATASETS), choices=list(DATASETS))
+    parser.add_argument("--stemming", action="store_true")
+    parser.add_argument("--precisions", nargs="+", default=list(functions.PRECISIONS[1:]), choices=list(functions.PRECISIONS[1:]))
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+    write_json(run(args.datasets, args.stemming, functions.weighting_schemes(), args.precisions, args.k), args.output)
@@ -0,0 +1,65 @@
+import argparse
+import time
+
+import numpy as np
+
+import functions
+import search
+from readers import DATASETS
+from benchmarks.common import load_dataset, load_qrels, write_json
+
+def ranking_matrix(rankings, shape):
+    # Dense scores rebuilt from full-depth rankings, so calculate_map can score them like cosine_similarity output
+    scores = np.zeros(shape)
+    for query_idx, ranking in enumerate(rankings):
+        for doc_idx, score in ranking:
+            scores[query_idx, doc_idx] = score
+    return scores
+
+def run(names, scheme, k, prune):
+    results = []
+    for name in names:
+        documents, queries = load_dataset(name)
+        qrels = load_qrels(name)
+        preprocessor = functions.Preprocessor()
+        documents = [preprocessor.tokenize(doc) for doc in documents]
+        queries = [preprocessor.tokenize(query) for query in queries]
+
+        start = time.perf_counter()
+        index = search.InvertedIndex.from_documents(documents, scheme[:3])
+        build_seconds = time.perf_counter() - start
+        query_vectors = search.scheme_vectorizer(queries, scheme[3:], vocabulary=index.vectorizer.vocabulary_).fit_transform(queries)
+
+        latencies = []
+        rankings = []
+        for i in range(query_vectors.shape[0]):
+            start = time.perf_counter()
+            rankings.append(index.search(query_vectors[i], k=k, prune=prune))
+            latencies.append(time.perf_counter() - start)
+
+        exact = functions.SchemeSweep(documents, queries).similarities(scheme[:3], scheme[3:])
+        agreement = np.mean([np.allclose([score for _, score in ranking], np.sort(exact[i])[::-1][:len(ranking)])
+                             for i, ranking in enumerate(rankings)])
+        row = {"dataset": name, "scheme": ''.join(scheme[:3]) + '.' + ''.join(scheme[3:]), "k": k, "prune": prune,
+               "build_seconds": build_seconds,
+               "latency_ms": {"mean": 1e3 * np.mean(latencies), "p50": 1e3 * np.percentile(latencies, 50), "p99": 1e3 * np.percentile(latencies, 99)},
+               "topk_agreement": agreement}
+        if qrels is not None:
+            full = index.search_batch(query_vectors, k=len(documents))
+            row["map_exact"] = functions.calculate_map(exact, qrels)
+            row["map_index"] = functions.calculate_map(ranking_matrix(full, exact.shape), qrels)
+        results.append(row)
+        print(f"{name.upper()} - p50 {row['latency_ms']['p50']:.3f} ms, p99 {row['latency_ms']['p99']:.3f} ms, "
+              f"top-{k} agreement {agreement:.3f}", flush=True)
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-query latency and exactness of the inverted-index engine against cosine_similarity")
+    parser.add_argument("--datasets", nargs="+", default=list(DATASETS), choices=list(DATASETS))
+    parser.add_argument("--scheme", default="ntc.ntc", help="document.query weighting scheme, e.g. ltc.nnn")
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--prune", action="store_true", help="enable MaxScore early termination")
+    parser.add_argument("--output")
+    args = parser.parse_args()
+    scheme = tuple(args.scheme.replace('.', ''))
+    write_json(run(args.datasets, scheme, args.k, args.prune), args.output)
@@ -0,0 +1,52 @@
+import argparse
+import time
+
+import numpy as np
+
+import functions
+import indexing
+import search
+import shards
+from benchmarks.common import write_json
+from readers import DATASETS
+
+def run(names, scheme, shard_counts, k, block_size):
+    results = []
+    for name in names:
+        dataset = DATASETS[name]
+        term_index = indexing.dataset_index(dataset, False)
+        sweep = term_index.sweep()
+        doc_vectors, query_vectors = sweep.document_vectors(scheme[:3]), sweep.query_vectors(scheme[3:])
+
+        start = time.perf_counter()
+        exact = list(search.iter_top_k(query_vectors, doc_vectors, k, block_size))
+        single_seconds = time.perf_counter() - start
+        qrels = dataset.qrels()
+        for n_shards in shard_counts:
+            start = time.perf_counter()
+            with shards.ShardedIndex.from_term_index(term_index, n_shards, scheme[:3]) as index:
+                startup_seconds = time.perf_counter() - start
+                start = time.perf_counter()
+                sharded = list(index.iter_top_k(query_vectors, k, block_size))
+                seconds = time.perf_counter() - start
+            scores = np.zeros((query_vectors.shape[0], doc_vectors.shape[0]))
+            for query, doc, score, _ in sharded:
+                scores[query, doc] = score
+            row = {"dataset": name, "scheme": ''.join(scheme[:3]) + '.' + ''.join(scheme[3:]), "shards": n_shards, "k": k,
+                   "startup_seconds": startup_seconds, "query_seconds": seconds, "single_process_seconds": single_seconds,
+                   "identical": sharded == exact, f"map@{k}": functions.calculate_map(scores, qrels, k=k)}
+            results.append(row)
+            print(f"{name.upper()} {n_shards} shards - {seconds:.3f}s vs {single_seconds:.3f}s in one process, "
+                  f"identical to unsharded: {row['identical']}", flush=True)
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scatter-gather top-k over document shards in worker processes, checked against one process")
+    parser.add_argument("--datasets", nargs="+", default=list(DATASETS), choices=list(DATASETS))
+    parser.add_argument("--scheme", default="ltc.ltc", help="document.query weighting scheme")
+    parser.add_argument("--shards", nargs="+", type=int, default=[1, 2, 4])
+    parser.add_argument("-k", type=int, default=100)
+    parser.add_argument("--block-size", type=int, default=256)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+    write_json(run(args.datasets, tuple(args.scheme.replace('.', '')), args.shards, args.k, args.block_size), args.output)
@@ -0,0 +1,69 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from benchmarks.common import write_json
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULES = ["functions", "indexing", "readers", "sweep", "search", "server", "vectorizers"]
+HEAVY = ("sklearn", "nltk")
+# A prebuilt-index sweep and a cache-served one, the two short-lived jobs that should never pay for scikit-learn
+COMMANDS = {
+    "sweep-index": ["sweep.py", "--datasets", "med", "--stemming", "off", "--schemes", "ltc.ltc", "--no-cache"],
+    "sweep-cached": ["sweep.py", "--datasets", "med", "--stemming", "off", "--schemes", "ltc.ltc"],
+}
+
+def importtime(args):
+    # Runs python -X importtime and returns (wall seconds, [(cumulative us, depth, module), ...])
+    start = time.perf_counter()
+    completed = subprocess.run([sys.executable, "-X", "importtime"] + args, cwd=ROOT, capture_output=True, text=True, check=True)
+    seconds = time.perf_counter() - start
+    imports = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        imports.append((int(cumulative), (len(name) - len(name.lstrip())) // 2, name.strip()))
+    return seconds, imports
+
+def heavy_modules(imports):
+    return sorted({name.split('.')[0] for _, _, name in imports if name.split('.')[0] in HEAVY})
+
+def measure_import(module, repeats):
+    runs = [importtime(["-c", f"import {module}"]) for _ in range(repeats)]
+    cumulative = [next(us for us, _, name in imports if name == module) for _, imports in runs]
+    _, imports = runs[-1]
+    # The direct dependencies that cost the most, which is where a lazy import pays off
+    children = sorted(((us, name) for us, depth, name in imports if depth == 1), reverse=True)[:5]
+    return {"module": module, "import_ms": statistics.median(cumulative) / 1e3, "heavy_imports": heavy_modules(imports),
+            "heaviest": [{"module": name, "ms": us / 1e3} for us, name in children]}
+
+def measure_command(name, argv, repeats):
+    # The first run builds whatever index or cache entry the command needs, so only warm starts are timed
+    importtime(argv)
+    runs = [importtime(argv) for _ in range(repeats)]
+    return {"command": name, "argv": argv, "wall_ms": statistics.median(seconds for seconds, _ in runs) * 1e3,
+            "heavy_imports": heavy_modules(runs[-1][1])}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cold-start import time of each module and wall time of short-lived jobs")
+    parser.add_argument("--modules", nargs="+", default=MODULES)
+    parser.add_argument("--commands", nargs="+", default=list(COMMANDS), choices=list(COMMANDS))
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    results = {"python": sys.version.split()[0], "imports": [], "commands": []}
+    for module in args.modules:
+        row = measure_import(module, args.repeats)
+        results["imports"].append(row)
+        print(f"import {module}: {row['import_ms']:.1f} ms" + (f" (loads {', '.join(row['heavy_imports'])})" if row["heavy_imports"] else ""),
+              flush=True)
+    for name in args.commands:
+        row = measure_command(name, COMMANDS[name], args.repeats)
+        results["commands"].append(row)
+        print(f"{name}: {row['wall_ms']:.1f} ms" + (f" (loads {', '.join(row['heavy_imports'])})" if row["heavy_imports"] else ""), flush=True)
+    write_json(results, args.output)
@@ -0,0 +1,71 @@
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+from sklearn.preprocessing import normalize
+
+import functions
+from readers import DATASETS
+from benchmarks.common import load_dataset, write_json
+
+TF_METHODS = ['n', 'l', 'a', 'b']
+IDF_METHODS = ['n', 't']
+NORMALIZATIONS = ['n', 'c']
+
+def dense_idf_fit_transform(vectorizer, documents):
+    # The previous implementation, kept only as a baseline to measure against
+    X = super(functions.CustomTfidfVectorizer, vectorizer).fit_transform(documents)
+    X = functions.apply_tf(X, vectorizer.tf_method)
+    if vectorizer.idf_method == 't':
+        X = X * np.diag(vectorizer.idf_)
+    if vectorizer.normalization == 'c':
+        X = normalize(X, norm='l2')
+    return X
+
+def measure(fit, documents, scheme, repeat):
+    timings = []
+    peak = 0
+    for _ in range(repeat):
+        vectorizer = functions.CustomTfidfVectorizer(tf_method=scheme[0], idf_method=scheme[1], normalization=scheme[2])
+        tracemalloc.start()
+        start = time.perf_counter()
+        fit(vectorizer, documents)
+        timings.append(time.perf_counter() - start)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return {"seconds": min(timings), "peak_bytes": peak}
+
+def dense_bytes(documents):
+    # V x V diagonal plus the N x V product it densifies into
+    vocabulary = len(functions.CustomTfidfVectorizer().fit(documents).vocabulary_)
+    return 8 * vocabulary * (vocabulary + len(documents))
+
+def run(names, stemming, repeat, dense_baseline, dense_limit):
+    results = []
+    for name in names:
+        documents, _ = load_dataset(name)
+        documents = [functions.preprocess_text(doc, set(), stemming=stemming) for doc in documents]
+        estimate = dense_bytes(documents) if dense_baseline else 0
+        for scheme in [(tf, idf, norm) for tf in TF_METHODS for idf in IDF_METHODS for norm in NORMALIZATIONS]:
+            row = {"dataset": name, "scheme": ''.join(scheme), "documents": len(documents)}
+            row["sparse"] = measure(lambda v, d: v.fit_transform(d), documents, scheme, repeat)
+            if dense_baseline and estimate <= dense_limit * 2**20:
+                row["dense"] = measure(dense_idf_fit_transform, documents, scheme, repeat)
+            elif dense_baseline:
+                row["dense"] = {"skipped": True, "estimated_bytes": estimate}
+            results.append(row)
+            print(f"{name.upper()} - {row['scheme']}: {row['sparse']['seconds']:.3f}s, "
+                  f"{row['sparse']['peak_bytes'] / 2**20:.1f} MiB peak", flush=True)
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Memory and latency of CustomTfidfVectorizer.fit_transform per tf/idf/norm scheme")
+    parser.add_argument("--datasets", nargs="+", default=list(DATASETS), choices=list(DATASETS))
+    parser.add_argument("--stemming", action="store_true")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--dense-baseline", action="store_true", help="also measure the old dense np.diag IDF multiply")
+    parser.add_argument("--dense-limit", type=int, default=1024, help="skip the dense baseline above this many MiB")
+    parser.add_argument("--output")
+    args = parser.parse_args()
+    write_json(run(args.datasets, args.stemming, args.repeat, args.dense_baseline, args.dense_limit), args.output)
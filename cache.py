@@ -0,0 +1,107 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+import numpy as np
+
+import indexing
+
+CACHE_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache")
+DEFAULT_BUDGET = 512 << 20
+
+def cache_key(*parts):
+    # Content address of anything JSON-serializable; tuples and lists hash the same
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode()).hexdigest()
+
+def content_hashes(paths):
+    return [indexing.file_hash(path) for path in paths]
+
+class ResultCache:
+    # Similarity matrices and MAP scores on disk, evicted least recently used first once the budget is exceeded.
+    # Recency is the file mtime, which every hit bumps, so it survives across runs without a separate journal.
+    def __init__(self, root=CACHE_ROOT, budget=DEFAULT_BUDGET):
+        self.root = root
+        self.budget = budget
+        self._size = None
+        # Datasets may be swept on concurrent threads that share one cache
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def path(self, key, suffix):
+        return os.path.join(self.root, key[:2], key + suffix)
+
+    def _entries(self):
+        for directory, _, files in os.walk(self.root):
+            for name in files:
+                # Entries still being written keep their temporary name and are left alone
+                if not name.endswith((".json", ".npy")):
+                    continue
+                path = os.path.join(directory, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield stat.st_mtime_ns, stat.st_size, path
+
+    def size(self):
+        if self._size is None:
+            self._size = sum(size for _, size, _ in self._entries()) if os.path.isdir(self.root) else 0
+        return self._size
+
+    def _read(self, path, load):
+        # An entry can be evicted between the lookup and the read, which is just a miss
+        try:
+            os.utime(path)
+            with open(path, 'rb') as file:
+                value = load(file)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return value
+
+    def _write(self, path, write):
+        # Written under a temporary name and renamed, so a reader never sees a partial entry
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        descriptor, temporary = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(descriptor, 'wb') as file:
+            write(file)
+        with self._lock:
+            size = self.size() + os.path.getsize(temporary) - (os.path.getsize(path) if os.path.exists(path) else 0)
+            os.replace(temporary, path)
+            self._size = size
+            if self._size > self.budget:
+                self._evict()
+
+    def _evict(self):
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.budget:
+                break
+            os.remove(path)
+            total -= size
+        self._size = total
+
+    def clear(self):
+        with self._lock:
+            for _, _, path in list(self._entries()):
+                os.remove(path)
+            self._size = 0
+
+    def score(self, key):
+        return self._read(self.path(key, ".json"), json.load)
+
+    def put_score(self, key, value):
+        self._write(self.path(key, ".json"), lambda file: file.write(json.dumps(value).encode()))
+
+    def array(self, key, compute):
+        path = self.path(key, ".npy")
+        value = self._read(path, np.load)
+        if value is None:
+            value = compute()
+            self._write(path, lambda file: np.save(file, value))
+        return value
@@ -0,0 +1,84 @@
+import numpy as np
+from sklearn.decomposition import TruncatedSVD
+from sklearn.preprocessing import normalize
+
+class LsaProjection:
+    # Truncated SVD of a weighted document-term matrix; documents and queries land in the same rank-r space
+    def __init__(self, rank=200, seed=0):
+        self.rank = rank
+        self.seed = seed
+
+    def fit_transform(self, doc_vectors):
+        rank = min(self.rank, min(doc_vectors.shape) - 1)
+        self.svd = TruncatedSVD(n_components=rank, random_state=self.seed)
+        return normalize(self.svd.fit_transform(doc_vectors))
+
+    def transform(self, query_vectors):
+        return normalize(self.svd.transform(query_vectors))
+
+def exact_search(doc_vectors, query_vectors, k=10):
+    # Brute-force inner product over unit vectors, the reference the ANN index is measured against
+    scores = query_vectors @ doc_vectors.T
+    return top_k(scores, k)
+
+def top_k(scores, k):
+    k = min(k, scores.shape[1])
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1, kind='stable')
+    ids = np.take_along_axis(top, order, axis=1)
+    return ids, np.take_along_axis(scores, ids, axis=1)
+
+class IVFIndex:
+    # Inverted-file index: spherical k-means cells, and a query only scans the nprobe cells closest to it
+    def __init__(self, vectors, n_lists=None, iterations=10, seed=0):
+        self.vectors = np.ascontiguousarray(vectors, dtype=np.float64)
+        n = len(self.vectors)
+        # More cells than documents would leave k-means nothing to seed them with
+        n_lists = min(n_lists or max(1, int(np.sqrt(n))), n)
+        rng = np.random.default_rng(seed)
+        centroids = self.vectors[rng.choice(n, size=n_lists, replace=False)]
+        for _ in range(iterations):
+            assignment = np.argmax(self.vectors @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, self.vectors)
+            empty = np.bincount(assignment, minlength=n_lists) == 0
+            # Reseed empty cells with random documents so every list stays in use
+            sums[empty] = self.vectors[rng.choice(n, size=int(empty.sum()), replace=False)]
+            centroids = normalize(sums)
+        self.centroids = centroids
+        assignment = np.argmax(self.vectors @ centroids.T, axis=1)
+        order = np.argsort(assignment, kind='stable')
+        self.list_ids = order
+        self.list_offsets = np.concatenate([[0], np.cumsum(np.bincount(assignment, minlength=n_lists))])
+
+    @property
+    def n_lists(self):
+        return len(self.centroids)
+
+    def search(self, query_vectors, k=10, nprobe=8):
+        nprobe = min(nprobe, self.n_lists)
+        cells = top_k(query_vectors @ self.centroids.T, nprobe)[0]
+        ids = np.full((len(query_vectors), k), -1)
+        scores = np.full((len(query_vectors), k), -np.inf)
+        for row, query in enumerate(query_vectors):
+            candidates = np.concatenate([self.list_ids[self.list_offsets[cell]:self.list_offsets[cell + 1]] for cell in cells[row]])
+            if len(candidates) == 0:
+                continue
+            candidate_scores = self.vectors[candidates] @ query
+            best, best_scores = top_k(candidate_scores[None, :], k)
+            ids[row, :best.shape[1]] = candidates[best[0]]
+            scores[row, :best.shape[1]] = best_scores[0]
+        return ids, scores
+
+def recall(approximate_ids, exact_ids):
+    # Fraction of the exact top-k the approximate search also returned
+    hits = [len(set(a[a >= 0]) & set(e)) / len(e) for a, e in zip(approximate_ids, exact_ids)]
+    return float(np.mean(hits))
+
+def ranking_scores(ids, scores, n_docs):
+    # Query x document matrix holding the retrieved scores, everything else ranked below them
+    matrix = np.full((len(ids), n_docs), -np.inf)
+    rows = np.repeat(np.arange(len(ids)), ids.shape[1])
+    valid = ids.ravel() >= 0
+    matrix[rows[valid], ids.ravel()[valid]] = scores.ravel()[valid]
+    return matrix
@@ -1,15 +1,47 @@
+import os
 import re
+from array import array
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-from sklearn.preprocessing import normalize
-from nltk.stem import PorterStemmer
+import scipy.sparse as sp
+
+import instrument
+
+# scikit-learn and NLTK are only imported on the paths that need them, so loading a prebuilt index and scoring it
+# stays NumPy/SciPy-only. The sklearn-backed vectorizers live in vectorizers.py and are still reachable from here.
+_VECTORIZERS = ("term_vectorizer", "CustomTfidfVectorizer", "compute_tfidf_and_similarity")
+
+def __getattr__(name):
+    if name in _VECTORIZERS:
+        import vectorizers
+        return getattr(vectorizers, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 def read_file(filepath):
     with open(filepath, 'r') as file:
         content = file.read()
     return content
 
+def iter_records(filepath, separator, skip_first=True):
+    # Streams the text between separator matches line by line, like re.split(separator, content)[1:] without loading the file
+    pattern = re.compile(separator)
+    parts = []
+    started = not skip_first
+    with open(filepath, 'r') as file:
+        for line in file:
+            pieces = pattern.split(line)
+            for i, piece in enumerate(pieces):
+                if i > 0:
+                    if started:
+                        yield ''.join(parts)
+                    parts = []
+                    started = True
+                parts.append(piece)
+    if started:
+        yield ''.join(parts)
+
 def read_stopwords(filepath):
     if not filepath:
         return set()
@@ -17,80 +49,401 @@ def read_stopwords(filepath):
         stopwords = set(file.read().split())
     return stopwords
 
-def preprocess_text(text, stopwords, stemming=False):
+def tokenize(text, stopwords):
     text = text.lower()
     text = re.sub(r'[^\w\s]', '', text)
     tokens = text.split()
-    tokens = [token for token in tokens if token not in stopwords]
+    return [token for token in tokens if token not in stopwords]
+
+class Preprocessor:
+    # Holds one PorterStemmer and an LRU memo of its stems; most tokens in these collections repeat heavily
+    def __init__(self, stopwords=(), cache_size=2**16, stem=None):
+        self.stopwords = set(stopwords)
+        self.cache_size = cache_size
+        # Pass another Preprocessor's stem to share one memo across collections
+        self._stem = stem
+
+    @property
+    def stem(self):
+        # NLTK is imported the first time something is actually stemmed
+        if self._stem is None:
+            from nltk.stem import PorterStemmer
+            self._stem = lru_cache(maxsize=self.cache_size)(PorterStemmer().stem)
+        return self._stem
+
+    def tokenize(self, text):
+        return tokenize(text, self.stopwords)
+
+    def stem_tokens(self, tokens):
+        stem = self.stem
+        return [stem(token) for token in tokens]
+
+    def process(self, text, stemming=False):
+        tokens = self.tokenize(text)
+        return self.stem_tokens(tokens) if stemming else tokens
+
+    def cache_info(self):
+        # Hits and misses of the stem memo, or None if nothing has been stemmed yet (so NLTK is not loaded just to ask)
+        if self._stem is None:
+            return None
+        return self._stem.cache_info()
+
+_preprocessor = Preprocessor()
+
+class TermTable:
+    # Interns each distinct term once; documents then only carry integer ids
+    def __init__(self):
+        self.ids = {}
+        self.terms = []
+
+    def encode(self, tokens):
+        ids = self.ids
+        encoded = array('I')
+        for token in tokens:
+            term = ids.get(token)
+            if term is None:
+                term = ids[token] = len(self.terms)
+                self.terms.append(token)
+            encoded.append(term)
+        return encoded
+
+class CompactCorpus:
+    # All documents' term ids in one flat uint32 array, delimited by offsets
+    def __init__(self):
+        self.ids = array('I')
+        self.offsets = array('Q', [0])
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def append(self, ids):
+        self.ids.extend(ids)
+        self.offsets.append(len(self.ids))
+
+    def extend(self, ids, lengths):
+        # Appends a whole chunk of documents at once: their concatenated ids and each one's length
+        self.ids.frombytes(np.asarray(ids, dtype=np.uint32).tobytes())
+        ends = len(self.ids) - int(np.sum(lengths, dtype=np.uint64)) + np.cumsum(lengths, dtype=np.uint64)
+        self.offsets.frombytes(ends.astype(np.uint64).tobytes())
+
+    def document(self, i):
+        return self.ids[self.offsets[i]:self.offsets[i + 1]]
+
+    def count_matrix(self, mapping, n_columns):
+        # mapping sends each term id to a column, or -1 to drop it; duplicates are summed by the COO to CSR conversion
+        columns = mapping[np.frombuffer(self.ids, dtype=np.uint32)]
+        rows = np.repeat(np.arange(len(self)), np.diff(np.frombuffer(self.offsets, dtype=np.uint64)).astype(np.int64))
+        keep = columns >= 0
+        counts = sp.coo_matrix((np.ones(int(keep.sum())), (rows[keep], columns[keep])), shape=(len(self), n_columns))
+        return counts.tocsr()
+
+@instrument.timed("preprocess_text")
+def preprocess_text(text, stopwords, stemming=False):
+    tokens = tokenize(text, stopwords)
     if stemming:
-        stemmer = PorterStemmer()
-        tokens = [stemmer.stem(token) for token in tokens]
+        tokens = _preprocessor.stem_tokens(tokens)
     return ' '.join(tokens)
 
-class CustomTfidfVectorizer(TfidfVectorizer):
-    def __init__(self, tf_method='n', idf_method='t', normalization='c', **kwargs):
-        super().__init__(**kwargs)
-        self.tf_method = tf_method
-        self.idf_method = idf_method
-        self.normalization = normalization
-    
-    def _tf(self, X):
-        if self.tf_method == 'n':
-            return X
-        elif self.tf_method == 'l':
-            return X.log1p()
-        elif self.tf_method == 'a':
-            return X
-        elif self.tf_method == 'b':
-            return (X > 0).astype(float)
+def analyze_tokens(tokens):
+    # Matches TfidfVectorizer's default token_pattern on already preprocessed text, which drops one-character tokens
+    return [token for token in tokens if len(token) > 1]
+
+def apply_tf(X, tf_method):
+    if tf_method == 'n':
         return X
-    
-    def fit_transform(self, raw_documents, y=None):
-        X = super().fit_transform(raw_documents)
-        X = self._tf(X)
-        if self.idf_method == 't':
-            self._idf_diag = np.diag(self.idf_)
-            X = X * self._idf_diag
-        if self.normalization == 'c':
-            X = normalize(X, norm='l2')
+    elif tf_method == 'l':
+        return X.log1p()
+    elif tf_method == 'a':
+        return X
+    elif tf_method == 'b':
+        return (X > 0).astype(float)
+    return X
+
+def apply_idf(X, idf):
+    # Scale the CSR columns in place rather than multiplying by a dense V x V diagonal
+    X = sp.csr_matrix(X, copy=True)
+    X.data *= idf[X.indices]
+    return X
+
+def l2_normalize(X):
+    # Row l2 normalization of a sparse matrix with the same arithmetic as sklearn.preprocessing.normalize (squares summed
+    # in row order, zero rows left alone), so every score stays bit-identical without importing scikit-learn
+    X = sp.csr_matrix(X, copy=True)
+    if X.dtype not in (np.float32, np.float64):
+        X = X.astype(np.float64)
+    rows = np.repeat(np.arange(X.shape[0]), np.diff(X.indptr))
+    norms = np.sqrt(np.bincount(rows, weights=X.data * X.data, minlength=X.shape[0]))
+    norms[norms == 0] = 1
+    # Squares are taken in the matrix dtype but summed and divided in float64, as sklearn does for float32 input
+    X.data = (X.data / norms[rows]).astype(X.dtype)
+    return X
+
+def apply_weighting(X, idf, scheme):
+    tf_method, idf_method, normalization = scheme
+    X = apply_tf(X, tf_method)
+    if idf_method == 't':
+        X = apply_idf(X, idf)
+    if normalization == 'c':
+        X = l2_normalize(X)
+    return X
+
+def relevance_matrix(qrels, n_queries, n_docs):
+    # Boolean (query, doc) judgments plus the number of relevant docs per query, including ids outside the collection
+    relevant = np.zeros((n_queries, n_docs), dtype=bool)
+    n_relevant = np.zeros(n_queries)
+    for qid, dids in qrels.items():
+        if 1 <= qid <= n_queries:
+            dids = np.fromiter(dids, dtype=np.int64)
+            relevant[qid - 1, dids[(dids >= 1) & (dids <= n_docs)] - 1] = True
+            n_relevant[qid - 1] = len(dids)
+    return relevant, n_relevant
+
+def rank_documents(similarities, depth=None):
+    # Best-first document indices per query; argpartition narrows to the top depth before sorting
+    n_docs = similarities.shape[1]
+    if depth is None or depth >= n_docs:
+        return np.argsort(similarities, axis=1)[:, ::-1]
+    top = np.argpartition(-similarities, depth - 1, axis=1)[:, :depth]
+    order = np.argsort(np.take_along_axis(similarities, top, axis=1), axis=1)[:, ::-1]
+    return np.take_along_axis(top, order, axis=1)
+
+@instrument.timed("evaluate")
+def evaluate(similarities, qrels, k=None, precision_at=10, relevance=None):
+    if k is not None and k < 1:
+        raise ValueError(f"k must be at least 1, got {k}")
+    similarities = np.asarray(similarities)
+    if relevance is None:
+        relevance = relevance_matrix(qrels, *similarities.shape)
+    relevant, n_relevant = relevance
+    judged = n_relevant > 0
+    similarities, relevant, n_relevant = similarities[judged], relevant[judged], n_relevant[judged]
+    if not judged.any():
+        # Nothing to average over, with or without a cutoff
+        return {"map": np.nan, "precision": np.nan, "r_precision": np.nan, "ndcg": np.nan}
+
+    depth = None
+    if k is not None:
+        depth = max(k, precision_at, int(n_relevant.max()))
+    ranked = rank_documents(similarities, depth)
+    hits = np.take_along_axis(relevant, ranked, axis=1)
+    cumulative = np.cumsum(hits, axis=1)
+    ranks = np.arange(1, ranked.shape[1] + 1)
+
+    cutoff = ranked.shape[1] if k is None else min(k, ranked.shape[1])
+    precisions = cumulative[:, :cutoff] / ranks[:cutoff]
+    average_precisions = (precisions * hits[:, :cutoff]).sum(axis=1) / n_relevant
+
+    at = min(precision_at, ranked.shape[1])
+    r = np.minimum(n_relevant.astype(int), ranked.shape[1])
+    r_precision = cumulative[np.arange(len(r)), np.maximum(r, 1) - 1] / np.maximum(n_relevant, 1)
+
+    discounts = 1 / np.log2(ranks[:cutoff] + 1)
+    dcg = (hits[:, :cutoff] * discounts).sum(axis=1)
+    ideal = np.cumsum(discounts)[np.minimum(n_relevant.astype(int), cutoff) - 1]
+
+    return {
+        "map": np.mean(average_precisions),
+        "precision": np.mean(cumulative[:, at - 1] / at),
+        "r_precision": np.mean(r_precision),
+        "ndcg": np.mean(dcg / ideal),
+    }
+
+def calculate_map(similarities, qrels, k=None, relevance=None):
+    return evaluate(similarities, qrels, k=k, relevance=relevance)["map"]
+
+def weighting_schemes():
+    tf_methods = ['n', 'l', 'a', 'b']
+    idf_methods = ['n', 't']
+    normalizations = ['n', 'c']
+    return [(tf_d, idf_d, norm_d, tf_q, idf_q, norm_q)
+            for tf_d in tf_methods for idf_d in idf_methods for norm_d in normalizations
+            for tf_q in tf_methods for idf_q in idf_methods for norm_q in normalizations]
+
+def smooth_idf(counts):
+    # Same smoothed IDF as TfidfVectorizer: ln((1 + n) / (1 + df)) + 1
+    df = np.bincount(counts.indices, minlength=counts.shape[1]).astype(np.float64)
+    return np.log((counts.shape[0] + 1) / (df + 1)) + 1
+
+def tfidf_base(counts, idf):
+    # The l2-normalized tf-idf matrix TfidfVectorizer would produce from these raw counts
+    return l2_normalize(apply_idf(counts.astype(np.float64), idf))
+
+PRECISIONS = ("float64", "float32", "int8")
+
+class Int8Matrix:
+    # Sparse int8 weights with one float32 scale per term (column), so each term keeps its full 8-bit range
+    def __init__(self, X):
+        X = sp.csr_matrix(X)
+        scales = np.asarray(abs(X).max(axis=0).todense()).ravel() / 127
+        scales[scales == 0] = 1
+        self.scales = scales.astype(np.float32)
+        self.values = sp.csr_matrix((np.rint(X.data / scales[X.indices]).astype(np.int8), X.indices, X.indptr), shape=X.shape)
+
+    @property
+    def shape(self):
+        return self.values.shape
+
+    @property
+    def nbytes(self):
+        return self.values.data.nbytes + self.values.indices.nbytes + self.values.indptr.nbytes + self.scales.nbytes
+
+    def scaled(self, scales=1):
+        # float32 values with the term scales applied, times any further per-term factor
+        X = self.values.astype(np.float32)
+        X.data *= (self.scales * scales)[X.indices]
         return X
-    
-    def transform(self, raw_documents, copy=True):
-        X = super().transform(raw_documents)
-        X = self._tf(X)
-        if self.idf_method == 't':
-            X = X * self._idf_diag
-        if self.normalization == 'c':
-            X = normalize(X, norm='l2')
+
+def to_precision(X, precision):
+    if precision == "float64":
         return X
+    if precision == "float32":
+        return X.astype(np.float32)
+    if precision == "int8":
+        return Int8Matrix(X)
+    raise ValueError(f"unknown precision {precision!r}, expected one of {PRECISIONS}")
+
+def similarity_scores(query_units, doc_units):
+    # query x document inner products of matrices from to_precision, both sides in the same precision
+    if isinstance(doc_units, Int8Matrix):
+        # Both sides' term scales fold into the query, so the document side is only ever widened, never rescaled
+        return (query_units.scaled(doc_units.scales) @ doc_units.values.T.astype(np.float32)).toarray()
+    return (query_units @ doc_units.T).toarray()
+
+class SchemeSweep:
+    # Tokenizes documents and queries once, then derives every tf/idf/norm variant from the cached base matrices
+    # Unit vectors and similarities are computed in the precision given at construction
+    def __init__(self, documents, queries, precision="float64"):
+        from vectorizers import term_vectorizer
+        doc_vectorizer = term_vectorizer(documents)
+        self.doc_base = doc_vectorizer.fit_transform(documents).tocsr()
+        self.doc_idf = doc_vectorizer.idf_
+        self.vocabulary = doc_vectorizer.vocabulary_
+
+        query_vectorizer = term_vectorizer(queries, vocabulary=self.vocabulary)
+        self.query_base = query_vectorizer.fit_transform(queries).tocsr()
+        self.query_idf = query_vectorizer.idf_
+        self.precision = precision
+        self._clear_caches()
+
+    @classmethod
+    def from_matrices(cls, doc_base, doc_idf, query_base, query_idf, precision="float64"):
+        sweep = cls.__new__(cls)
+        sweep.doc_base = doc_base
+        sweep.doc_idf = doc_idf
+        sweep.vocabulary = None
+        sweep.query_base = query_base
+        sweep.query_idf = query_idf
+        sweep.precision = precision
+        sweep._clear_caches()
+        return sweep
+
+    @classmethod
+    def from_counts(cls, doc_counts, query_counts, precision="float64"):
+        doc_idf = smooth_idf(doc_counts)
+        query_idf = smooth_idf(query_counts)
+        return cls.from_matrices(tfidf_base(doc_counts, doc_idf), doc_idf, tfidf_base(query_counts, query_idf), query_idf, precision)
+
+    def _clear_caches(self):
+        self._doc_vectors = {}
+        self._query_vectors = {}
+        self._doc_units = {}
+        self._query_units = {}
+
+    def document_vectors(self, doc_scheme):
+        doc_scheme = tuple(doc_scheme)
+        if doc_scheme not in self._doc_vectors:
+            with instrument.stage("weight documents", scheme=''.join(doc_scheme)):
+                self._doc_vectors[doc_scheme] = apply_weighting(self.doc_base, self.doc_idf, doc_scheme)
+        return self._doc_vectors[doc_scheme]
+
+    def query_vectors(self, query_scheme):
+        query_scheme = tuple(query_scheme)
+        if query_scheme not in self._query_vectors:
+            with instrument.stage("weight queries", scheme=''.join(query_scheme)):
+                self._query_vectors[query_scheme] = apply_weighting(self.query_base, self.query_idf, query_scheme)
+        return self._query_vectors[query_scheme]
+
+    def document_units(self, doc_scheme):
+        # Normalized document rows in the sweep's precision, cached per scheme
+        return self._unit(self._doc_units, self.document_vectors, doc_scheme)
+
+    def query_units(self, query_scheme):
+        return self._unit(self._query_units, self.query_vectors, query_scheme)
+
+    def similarities(self, doc_scheme, query_scheme):
+        # Same as cosine_similarity, but each side is normalized once and reused across all pairings
+        doc_unit = self.document_units(doc_scheme)
+        query_unit = self.query_units(query_scheme)
+        with instrument.stage("similarity"):
+            return similarity_scores(query_unit, doc_unit)
+
+    def _unit(self, cache, vectors, scheme):
+        scheme = tuple(scheme)
+        if scheme not in cache:
+            cache[scheme] = to_precision(l2_normalize(vectors(scheme)), self.precision)
+        return cache[scheme]
+
+    def run(self, schemes, qrels, workers=1):
+        if workers > 1:
+            return self._run_parallel(schemes, qrels, workers)
+        relevance = relevance_matrix(qrels, self.query_base.shape[0], self.doc_base.shape[0])
+        results = []
+        for scheme in schemes:
+            # Named per scheme so the report carries a cost breakdown for each one
+            with instrument.stage("scheme " + ''.join(scheme[:3]) + '.' + ''.join(scheme[3:])):
+                similarities = self.similarities(scheme[:3], scheme[3:])
+                results.append((calculate_map(similarities, qrels, relevance=relevance), scheme))
+            instrument.count("schemes")
+        return results
+
+    def _run_parallel(self, schemes, qrels, workers):
+        # Workers memory-map the base matrices from a scratch directory instead of receiving a pickled copy per task
+        schemes = [tuple(scheme) for scheme in schemes]
+        # Keep schemes that share a document variant in the same chunk so workers reuse it
+        order = sorted(range(len(schemes)), key=lambda i: schemes[i])
+        chunksize = max(1, len(schemes) // (workers * 4))
+        with tempfile.TemporaryDirectory() as directory:
+            save_csr(os.path.join(directory, "doc"), self.doc_base)
+            save_csr(os.path.join(directory, "query"), self.query_base)
+            np.save(os.path.join(directory, "doc_idf.npy"), self.doc_idf)
+            np.save(os.path.join(directory, "query_idf.npy"), self.query_idf)
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_sweep_worker, initargs=(directory, qrels, self.precision)) as executor:
+                scores = list(executor.map(_sweep_worker_map, [schemes[i] for i in order], chunksize=chunksize))
+        results = [None] * len(schemes)
+        for i, score in zip(order, scores):
+            results[i] = (score, schemes[i])
+        return results
+
+def save_csr(prefix, X):
+    # Store in canonical form so the read-only mapped copy never needs sorting in place
+    X = X.copy()
+    X.sum_duplicates()
+    np.save(prefix + "_data.npy", X.data)
+    np.save(prefix + "_indices.npy", X.indices)
+    np.save(prefix + "_indptr.npy", X.indptr)
+    np.save(prefix + "_shape.npy", np.array(X.shape))
+
+def load_csr(prefix):
+    data = np.load(prefix + "_data.npy", mmap_mode='r')
+    indices = np.load(prefix + "_indices.npy", mmap_mode='r')
+    indptr = np.load(prefix + "_indptr.npy", mmap_mode='r')
+    shape = tuple(np.load(prefix + "_shape.npy"))
+    X = sp.csr_matrix((data, indices, indptr), shape=shape, copy=False)
+    X.has_canonical_format = True
+    return X
+
+_worker_sweep = None
+_worker_relevance = None
+
+def _init_sweep_worker(directory, qrels, precision="float64"):
+    global _worker_sweep, _worker_relevance
+    _worker_sweep = SchemeSweep.from_matrices(load_csr(os.path.join(directory, "doc")),
+                                              np.load(os.path.join(directory, "doc_idf.npy"), mmap_mode='r'),
+                                              load_csr(os.path.join(directory, "query")),
+                                              np.load(os.path.join(directory, "query_idf.npy"), mmap_mode='r'),
+                                              precision)
+    _worker_relevance = relevance_matrix(qrels, _worker_sweep.query_base.shape[0], _worker_sweep.doc_base.shape[0])
 
-def compute_tfidf_and_similarity(documents, queries, doc_scheme, query_scheme):
-    doc_vectorizer = CustomTfidfVectorizer(tf_method=doc_scheme[0], idf_method=doc_scheme[1], normalization=doc_scheme[2])
-    doc_vectors = doc_vectorizer.fit_transform(documents)
-    
-    query_vectorizer = CustomTfidfVectorizer(tf_method=query_scheme[0], idf_method=query_scheme[1], normalization=query_scheme[2], vocabulary=doc_vectorizer.vocabulary_)
-    query_vectors = query_vectorizer.fit_transform(queries)
-    
-    similarities = cosine_similarity(query_vectors, doc_vectors)
-    return similarities
-
-def calculate_map(similarities, qrels):
-    average_precisions = []
-    for query_idx, similarity_scores in enumerate(similarities):
-        relevant_docs = qrels.get(query_idx + 1, set())
-        if not relevant_docs:
-            continue
-
-        ranked_docs = np.argsort(similarity_scores)[::-1]
-        hits = 0
-        sum_precisions = 0
-        for rank, doc_idx in enumerate(ranked_docs):
-            if doc_idx + 1 in relevant_docs:
-                hits += 1
-                precision_at_k = hits / (rank + 1)
-                sum_precisions += precision_at_k
-
-        average_precision = sum_precisions / len(relevant_docs) if relevant_docs else 0
-        average_precisions.append(average_precision)
-
-    return np.mean(average_precisions)
\ No newline at end of file
+def _sweep_worker_map(scheme):
+    similarities = _worker_sweep.similarities(scheme[:3], scheme[3:])
+    return calculate_map(similarities, None, relevance=_worker_relevance)
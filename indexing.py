@@ -0,0 +1,568 @@
+import hashlib
+import itertools
+import json
+import os
+import shutil
+import tempfile
+import time
+from array import array
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import scipy.sparse as sp
+
+import functions
+import instrument
+import stopwords as stopword_lists
+
+FORMAT_VERSION = 3
+INDEX_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "index")
+
+class TermList:
+    # Terms as concatenated UTF-8 bytes plus offsets; a numpy string array would pad every term to the longest one in UTF-32
+    def __init__(self, data, offsets):
+        self.data = data
+        self.offsets = offsets
+
+    @classmethod
+    def from_strings(cls, terms):
+        encoded = [term.encode('utf-8') for term in terms]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(term) for term in encoded], out=offsets[1:])
+        return cls(np.frombuffer(b''.join(encoded), dtype=np.uint8), offsets.astype(np.uint32 if offsets[-1] <= 0xffffffff else np.int64))
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, term):
+        return self.data[self.offsets[term]:self.offsets[term + 1]].tobytes().decode('utf-8')
+
+    def __iter__(self):
+        data = self.data.tobytes()
+        offsets = self.offsets.tolist()
+        for start, end in zip(offsets[:-1], offsets[1:]):
+            yield data[start:end].decode('utf-8')
+
+    @property
+    def nbytes(self):
+        return self.data.nbytes + self.offsets.nbytes
+
+def save_terms(prefix, terms):
+    terms = terms if isinstance(terms, TermList) else TermList.from_strings(terms)
+    np.save(prefix + "_data.npy", terms.data)
+    np.save(prefix + "_offsets.npy", terms.offsets)
+
+def load_terms(prefix):
+    return TermList(np.load(prefix + "_data.npy", mmap_mode='r'), np.load(prefix + "_offsets.npy", mmap_mode='r'))
+
+class TermIndex:
+    # Raw term counts for a preprocessed collection; every weighting scheme is derived from these
+    def __init__(self, terms, doc_counts, query_counts):
+        self.terms = terms
+        self.doc_counts = doc_counts
+        self.query_counts = query_counts
+        self.doc_lengths = np.asarray(doc_counts.sum(axis=1)).ravel()
+        self.doc_idf = functions.smooth_idf(doc_counts)
+        self._vocabulary = None
+
+    @property
+    def vocabulary(self):
+        if self._vocabulary is None:
+            self._vocabulary = {term: i for i, term in enumerate(self.terms)}
+        return self._vocabulary
+
+    def sweep(self, precision="float64"):
+        return functions.SchemeSweep.from_counts(self.doc_counts, self.query_counts, precision)
+
+def build_compact_index(table, documents, queries, stem=None, stopwords=()):
+    with instrument.stage("build_index", stemming=stem is not None):
+        return _build_compact_index(table, documents, queries, stem, stopwords)
+
+def _build_compact_index(table, documents, queries, stem, stopwords):
+    # Same counts and sorted vocabulary CountVectorizer would build, but each distinct term is stemmed and filtered once.
+    # Stopwords are dropped by id before stemming, exactly where token-level filtering used to drop them.
+    forms = [stem(term) for term in table.terms] if stem else table.terms
+    used = np.zeros(len(forms), dtype=bool)
+    used[np.frombuffer(documents.ids, dtype=np.uint32)] = True
+    stopped = stopword_lists.term_mask(table.terms, stopwords) if stopwords else None
+    if stopped is not None:
+        used &= ~stopped
+    terms = sorted({forms[term] for term in np.flatnonzero(used) if len(functions.analyze_tokens([forms[term]])) == 1})
+    columns = {term: column for column, term in enumerate(terms)}
+    mapping = np.array([columns.get(form, -1) for form in forms], dtype=np.int64)
+    if stopped is not None:
+        mapping[stopped] = -1
+    return TermIndex(TermList.from_strings(terms), documents.count_matrix(mapping, len(terms)), queries.count_matrix(mapping, len(terms)))
+
+def index_path(dataset_name, stemming):
+    return os.path.join(INDEX_ROOT, dataset_name, "stemming" if stemming else "no-stemming")
+
+def index_options(dataset, stemming):
+    # Everything besides the source files that changes what an index holds, including the code that parses them
+    return {"stemming": stemming, "stopwords": dataset.stopwords, "parser": dataset.parser_fingerprint()}
+
+def dataset_index(dataset, stemming, collection=None):
+    collection = collection or LazyCollection(dataset.read_collection)
+    return load_or_build(index_path(dataset.name, stemming), dataset.sources(), index_options(dataset, stemming),
+                         lambda: collection.index(stemming))
+
+def incremental_index_path(dataset_name, stemming):
+    return os.path.join(INDEX_ROOT, dataset_name, "incremental-stemming" if stemming else "incremental-no-stemming")
+
+def load_or_sync(directory, sources, options, read_documents, process):
+    # The incremental counterpart of load_or_build: a changed source is synced document by document instead of rebuilt
+    index = IncrementalIndex.load(directory, options)
+    if index is not None and is_current(directory, sources, options):
+        return index
+    index = index or IncrementalIndex()
+    with instrument.stage("sync_index"):
+        index.sync(read_documents(), process)
+    index.save(directory, sources, options)
+    return index
+
+def dataset_incremental_index(dataset, stemming, documents_path=None, directory=None):
+    # Only the document file is synced; documents_path points the index at another copy of the collection.
+    # An edited stopword list changes every document, so its content is part of the options and forces a fresh build.
+    documents_path = documents_path or dataset.path(dataset.documents)
+    options = index_options(dataset, stemming)
+    if dataset.stopwords:
+        options["stopwords_sha256"] = file_hash(stopword_lists.path(dataset.stopwords))
+    preprocessor = functions.Preprocessor(dataset.read_stopwords())
+    directory = directory or incremental_index_path(dataset.name, stemming)
+    return load_or_sync(directory, [documents_path], options,
+                        lambda: dataset.reader.iter_documents(documents_path),
+                        lambda text: preprocessor.process(text, stemming=stemming))
+
+def file_hash(filepath):
+    digest = hashlib.sha256()
+    with open(filepath, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def fingerprint(sources):
+    entries = []
+    for source in sources:
+        stat = os.stat(source)
+        entries.append({"path": source, "size": stat.st_size, "mtime": stat.st_mtime_ns, "sha256": file_hash(source)})
+    return entries
+
+def replace_directory(directory, write):
+    # The files are written into a fresh directory next to the target and renamed into place, so concurrent builders
+    # never delete each other's files and a reader never sees a half-written index
+    parent = os.path.dirname(directory)
+    os.makedirs(parent, exist_ok=True)
+    temporary = tempfile.mkdtemp(dir=parent, prefix=os.path.basename(directory) + ".tmp-")
+    try:
+        write(temporary)
+        try:
+            os.rename(temporary, directory)
+            return
+        except OSError:
+            pass
+        # A directory can only be renamed over an empty one, so the old index is first moved aside
+        stale = tempfile.mkdtemp(dir=parent, prefix=os.path.basename(directory) + ".old-")
+        try:
+            os.replace(directory, stale)
+        except FileNotFoundError:
+            pass
+        try:
+            os.rename(temporary, directory)
+        except OSError:
+            # Another process published its index in between; both were built from the same inputs, so keep that one
+            pass
+        shutil.rmtree(stale, ignore_errors=True)
+    finally:
+        shutil.rmtree(temporary, ignore_errors=True)
+
+def write_manifest(directory, sources, options):
+    # The manifest is written last so a half-written index never validates
+    manifest = {"version": FORMAT_VERSION, "options": options, "sources": fingerprint(sources)}
+    with open(os.path.join(directory, "manifest.json"), 'w') as file:
+        json.dump(manifest, file, indent=2)
+
+def save_index(directory, term_index, sources, options):
+    def write(target):
+        save_terms(os.path.join(target, "terms"), term_index.terms)
+        functions.save_csr(os.path.join(target, "doc"), term_index.doc_counts)
+        functions.save_csr(os.path.join(target, "query"), term_index.query_counts)
+        np.save(os.path.join(target, "doc_lengths.npy"), term_index.doc_lengths)
+        np.save(os.path.join(target, "doc_idf.npy"), term_index.doc_idf)
+        write_manifest(target, sources, options)
+    replace_directory(directory, write)
+
+def read_manifest(directory, options):
+    # The manifest of an index saved with this format version and these options, or None
+    try:
+        with open(os.path.join(directory, "manifest.json"), 'r') as file:
+            manifest = json.load(file)
+    except FileNotFoundError:
+        return None
+    if manifest["version"] != FORMAT_VERSION or manifest["options"] != options:
+        return None
+    return manifest
+
+def is_current(directory, sources, options):
+    manifest = read_manifest(directory, options)
+    if manifest is None:
+        return False
+    if [entry["path"] for entry in manifest["sources"]] != list(sources):
+        return False
+    for entry in manifest["sources"]:
+        if not os.path.exists(entry["path"]):
+            return False
+        stat = os.stat(entry["path"])
+        if stat.st_size != entry["size"]:
+            return False
+        # A touched file is only stale if its content actually changed
+        if stat.st_mtime_ns != entry["mtime"] and file_hash(entry["path"]) != entry["sha256"]:
+            return False
+    return True
+
+def load_index(directory, sources, options):
+    # Returns None when the index is missing or stale; arrays are memory-mapped, not read
+    with instrument.stage("validate_index"):
+        current = is_current(directory, sources, options)
+    if not current:
+        return None
+    term_index = TermIndex.__new__(TermIndex)
+    try:
+        term_index.terms = load_terms(os.path.join(directory, "terms"))
+        term_index.doc_counts = functions.load_csr(os.path.join(directory, "doc"))
+        term_index.query_counts = functions.load_csr(os.path.join(directory, "query"))
+        term_index.doc_lengths = np.load(os.path.join(directory, "doc_lengths.npy"), mmap_mode='r')
+        term_index.doc_idf = np.load(os.path.join(directory, "doc_idf.npy"), mmap_mode='r')
+    except FileNotFoundError:
+        # Another process replaced the index while it was being opened
+        return None
+    term_index._vocabulary = None
+    return term_index
+
+def load_or_build(directory, sources, options, build):
+    term_index = load_index(directory, sources, options)
+    if term_index is None:
+        term_index = build()
+        save_index(directory, term_index, sources, options)
+    return term_index
+
+_ingest_preprocessor = None
+
+def tokenize_chunk(texts):
+    # Worker side of a parallel ingest: one chunk is encoded against its own term table, and each distinct term in it is
+    # stemmed once, so both stemming modes come out of the single tokenization pass
+    global _ingest_preprocessor
+    if _ingest_preprocessor is None:
+        # One stem memo per worker process, shared by every chunk it handles
+        _ingest_preprocessor = functions.Preprocessor()
+    preprocessor = _ingest_preprocessor
+    table = functions.TermTable()
+    ids = array('I')
+    lengths = array('I')
+    for text in texts:
+        encoded = table.encode(preprocessor.tokenize(text))
+        ids.extend(encoded)
+        lengths.append(len(encoded))
+    return table.terms, [preprocessor.stem(term) for term in table.terms], ids, lengths
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+class LazyCollection:
+    # Reads, parses and encodes the raw collection only when an index actually has to be (re)built
+    def __init__(self, read, stem=None, workers=1, chunk_size=256):
+        self._read = read
+        self._stem = stem
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.preprocessor = None
+        self.table = None
+        self.stems = {}
+        self.ingest_stats = None
+
+    def _encode(self):
+        documents, queries, self.stopwords = self._read()
+        # Stopwords are masked by term id when the index is built, so tokenizing does no per-token lookups
+        self.preprocessor = functions.Preprocessor(stem=self._stem)
+        tokenize = instrument.timed("tokenize", self.preprocessor.tokenize)
+        self.table = functions.TermTable()
+        self.documents = functions.CompactCorpus()
+        self.queries = functions.CompactCorpus()
+        start = time.perf_counter()
+        if self.workers > 1:
+            self._encode_parallel(documents)
+        else:
+            for doc in documents:
+                self.documents.append(self.table.encode(tokenize(doc)))
+        seconds = time.perf_counter() - start
+        for query in queries:
+            self.queries.append(self.table.encode(tokenize(query)))
+        self.ingest_stats = {"documents": len(self.documents), "seconds": seconds, "workers": self.workers,
+                             "docs_per_second": len(self.documents) / seconds if seconds > 0 else float("inf")}
+        instrument.count("documents", len(self.documents))
+        instrument.count("queries", len(self.queries))
+
+    def _encode_parallel(self, documents):
+        # Chunks are tokenized in a process pool and merged in submission order, so document ids stay aligned with
+        # the qrels; at most two chunks per worker are in flight, which bounds the raw text held in memory
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            pending = deque()
+            for chunk in chunked(documents, self.chunk_size):
+                pending.append(executor.submit(tokenize_chunk, chunk))
+                if len(pending) >= 2 * self.workers:
+                    self._merge_chunk(*pending.popleft().result())
+            while pending:
+                self._merge_chunk(*pending.popleft().result())
+
+    def _merge_chunk(self, terms, stems, ids, lengths):
+        # The chunk's local term ids are translated to the collection's table in one vectorized lookup
+        mapping = np.frombuffer(self.table.encode(terms), dtype=np.uint32)
+        self.documents.extend(mapping[np.frombuffer(ids, dtype=np.uint32)], np.frombuffer(lengths, dtype=np.uint32))
+        self.stems.update(zip(terms, stems))
+
+    def stem(self, term):
+        # Stems computed by the ingest workers, falling back to the shared stemmer for query-only terms
+        stem = self.stems.get(term)
+        return stem if stem is not None else self.preprocessor.stem(term)
+
+    def index(self, stemming):
+        # Both stemming modes come from the one unstemmed encoding
+        if self.table is None:
+            self._encode()
+        return build_compact_index(self.table, self.documents, self.queries, self.stem if stemming else None, self.stopwords)
+
+class IncrementalIndex:
+    # Appendable count store: new documents extend the vocabulary and CSR arrays, deletes are tombstones until compaction
+    def __init__(self, compact_ratio=0.25):
+        self.terms = []
+        self.vocabulary = {}
+        self.keys = []
+        self.compact_ratio = compact_ratio
+        self._indptr = [0]
+        self._indices = np.empty(1024, dtype=np.int32)
+        self._data = np.empty(1024, dtype=np.float64)
+        self._df = np.zeros(1024, dtype=np.int64)
+        self._live = np.zeros(1024, dtype=bool)
+        self._positions = {}
+        self._next_key = 1
+        self._weighted = {}
+        # Content digest of each document added by sync, so a later sync only re-tokenizes what changed
+        self.digests = {}
+
+    @classmethod
+    def from_term_index(cls, term_index, **kwargs):
+        index = cls(**kwargs)
+        counts = sp.csr_matrix(term_index.doc_counts)
+        index.terms = list(term_index.terms)
+        index.vocabulary = {term: i for i, term in enumerate(index.terms)}
+        index._reserve_terms(len(index.terms))
+        index._append_rows(counts.indptr, counts.indices, counts.data, list(range(1, counts.shape[0] + 1)))
+        return index
+
+    @property
+    def n_docs(self):
+        return len(self._indptr) - 1
+
+    @property
+    def n_live(self):
+        return int(self._live[:self.n_docs].sum())
+
+    @property
+    def df(self):
+        return self._df[:len(self.terms)]
+
+    def idf(self):
+        # Smoothed IDF over live documents, the same formula TfidfVectorizer fits
+        return np.log((self.n_live + 1) / (self.df + 1.0)) + 1
+
+    def _reserve_terms(self, size):
+        if size > len(self._df):
+            self._df = np.concatenate([self._df, np.zeros(max(size, 2 * len(self._df)) - len(self._df), dtype=np.int64)])
+
+    def _append_rows(self, indptr, indices, data, keys):
+        # Amortized doubling keeps appends O(new postings)
+        start = self._indptr[-1]
+        end = start + len(indices)
+        if end > len(self._indices):
+            capacity = max(end, 2 * len(self._indices))
+            self._indices = np.resize(self._indices, capacity)
+            self._data = np.resize(self._data, capacity)
+        self._indices[start:end] = indices
+        self._data[start:end] = data
+        first = self.n_docs
+        self._indptr.extend(start + np.asarray(indptr[1:]))
+        if self.n_docs > len(self._live):
+            self._live = np.concatenate([self._live, np.zeros(max(self.n_docs, 2 * len(self._live)) - len(self._live), dtype=bool)])
+        self._live[first:self.n_docs] = True
+        np.add.at(self._df, np.asarray(indices, dtype=np.int64), 1)
+        for position, key in enumerate(keys, start=first):
+            self.keys.append(key)
+            self._positions[key] = position
+            if isinstance(key, int):
+                self._next_key = max(self._next_key, key + 1)
+        self._weighted.clear()
+
+    def add_documents(self, token_lists, keys=None):
+        if keys is None:
+            keys = list(range(self._next_key, self._next_key + len(token_lists)))
+        if any(key in self._positions for key in keys):
+            raise ValueError("document keys must be unique")
+        indptr, indices, data = [0], [], []
+        vocabulary = self.vocabulary
+        for tokens in token_lists:
+            # Tokens are counted first, so the vocabulary is only consulted once per distinct token
+            counts = []
+            for token, count in Counter(functions.analyze_tokens(tokens)).items():
+                term = vocabulary.get(token)
+                if term is None:
+                    term = vocabulary[token] = len(self.terms)
+                    self.terms.append(token)
+                counts.append((term, count))
+            counts.sort()
+            indices.extend(term for term, _ in counts)
+            data.extend(count for _, count in counts)
+            indptr.append(len(indices))
+        self._reserve_terms(len(self.terms))
+        self._append_rows(indptr, indices, data, keys)
+        return keys
+
+    def delete_documents(self, keys):
+        # Every key is checked before anything changes, so a bad key leaves the index and its cached matrices as they were
+        keys = list(keys)
+        missing = [key for key in keys if key not in self._positions]
+        if missing:
+            raise KeyError(f"unknown document keys {missing}")
+        if len(set(keys)) != len(keys):
+            raise ValueError("document keys must be unique")
+        for key in keys:
+            position = self._positions.pop(key)
+            self.digests.pop(key, None)
+            self._live[position] = False
+            start, end = self._indptr[position], self._indptr[position + 1]
+            self._df[self._indices[start:end]] -= 1
+        self._weighted.clear()
+        if self.n_docs and 1 - self.n_live / self.n_docs > self.compact_ratio:
+            self.compact()
+
+    def compact(self):
+        # Drops tombstoned rows and terms no live document uses; keys survive, positions and term ids are renumbered
+        counts = self.counts()
+        live = np.flatnonzero(self._live[:self.n_docs])
+        used = np.flatnonzero(self.df > 0)
+        counts = counts[live][:, used].tocsr()
+        keys = [self.keys[position] for position in live]
+        terms = [self.terms[term] for term in used]
+
+        next_key, digests = self._next_key, self.digests
+        self.__init__(compact_ratio=self.compact_ratio)
+        self._next_key, self.digests = next_key, digests
+        self.terms = terms
+        self.vocabulary = {term: i for i, term in enumerate(terms)}
+        self._reserve_terms(len(terms))
+        self._append_rows(counts.indptr, counts.indices, counts.data, keys)
+
+    def sync(self, texts, process):
+        # Brings the index in line with a document sequence keyed by 1-based position, as in the qrels files: only
+        # documents whose text changed or is new are processed, and keys past the end of the sequence are deleted
+        changed = []
+        n = 0
+        for n, text in enumerate(texts, start=1):
+            digest = hashlib.sha256(text.encode('utf-8')).digest()
+            if self.digests.get(n) != digest:
+                changed.append((n, text, digest))
+        stale = [key for key in self._positions if not isinstance(key, int) or key > n]
+        stale.extend(key for key, _, _ in changed if key in self._positions)
+        self.delete_documents(stale)
+        self.add_documents([process(text) for _, text, _ in changed], keys=[key for key, _, _ in changed])
+        self.digests.update((key, digest) for key, _, digest in changed)
+        instrument.count("synced documents", len(changed))
+        return len(changed), len(stale)
+
+    def save(self, directory, sources, options):
+        # Same layout rules as save_index: written aside and renamed into place, with the same version, options and fingerprints
+        def write(target):
+            end = self._indptr[-1]
+            save_terms(os.path.join(target, "terms"), self.terms)
+            np.save(os.path.join(target, "indptr.npy"), np.asarray(self._indptr, dtype=np.int64))
+            np.save(os.path.join(target, "indices.npy"), self._indices[:end])
+            np.save(os.path.join(target, "data.npy"), self._data[:end])
+            np.save(os.path.join(target, "live.npy"), self._live[:self.n_docs])
+            # One 32-byte row per position, all zeros for documents that were added without a digest. Not an 'S32' array,
+            # which would strip the trailing zero bytes some digests end in.
+            empty = bytes(32)
+            digests = np.frombuffer(b''.join(self.digests.get(key, empty) for key in self.keys), dtype=np.uint8)
+            np.save(os.path.join(target, "digests.npy"), digests.reshape(len(self.keys), 32))
+            with open(os.path.join(target, "documents.json"), 'w') as file:
+                file.write(json.dumps({"keys": self.keys, "next_key": self._next_key, "compact_ratio": self.compact_ratio}))
+            write_manifest(target, sources, options)
+        replace_directory(directory, write)
+
+    @classmethod
+    def load(cls, directory, options):
+        # Returns None when there is no saved index with this version and options; changed sources are left to sync
+        if read_manifest(directory, options) is None:
+            return None
+        try:
+            return cls._load(directory)
+        except FileNotFoundError:
+            # Another process replaced the index while it was being read
+            return None
+
+    @classmethod
+    def _load(cls, directory):
+        with open(os.path.join(directory, "documents.json"), 'r') as file:
+            documents = json.load(file)
+        index = cls(compact_ratio=documents["compact_ratio"])
+        index.terms = list(load_terms(os.path.join(directory, "terms")))
+        index.vocabulary = {term: i for i, term in enumerate(index.terms)}
+        index._reserve_terms(len(index.terms))
+        indptr = np.load(os.path.join(directory, "indptr.npy"))
+        # Arrays are read rather than mapped, since appends grow them in place
+        index._append_rows(indptr, np.load(os.path.join(directory, "indices.npy")), np.load(os.path.join(directory, "data.npy")),
+                           documents["keys"])
+        live = np.load(os.path.join(directory, "live.npy"))
+        # A key deleted and added again by sync appears twice in keys; only its live row keeps the key
+        index._positions = {index.keys[position]: position for position in np.flatnonzero(live)}
+        for position in np.flatnonzero(~live):
+            index._live[position] = False
+            index._df[index._indices[indptr[position]:indptr[position + 1]]] -= 1
+        index._next_key = documents["next_key"]
+        digests = np.load(os.path.join(directory, "digests.npy"))
+        known = digests.any(axis=1) & live
+        index.digests = {index.keys[position]: digests[position].tobytes() for position in np.flatnonzero(known)}
+        return index
+
+    def counts(self):
+        # Tombstoned rows stay in place as empty rows so positions line up with keys
+        n = self.n_docs
+        end = self._indptr[-1]
+        counts = sp.csr_matrix((self._data[:end], self._indices[:end], np.asarray(self._indptr)), shape=(n, len(self.terms)))
+        return sp.diags(self._live[:n].astype(np.float64)) @ counts
+
+    def document_vectors(self, doc_scheme):
+        doc_scheme = tuple(doc_scheme)
+        if doc_scheme not in self._weighted:
+            idf = self.idf()
+            weighted = functions.apply_weighting(functions.tfidf_base(self.counts(), idf), idf, doc_scheme)
+            self._weighted[doc_scheme] = functions.l2_normalize(weighted).tocsr()
+        return self._weighted[doc_scheme]
+
+    def query_vector(self, tokens, query_scheme):
+        idf = self.idf()
+        # Terms whose only documents were deleted would get the largest IDF of all and inflate the query norm; a rebuild
+        # would not know them
+        df = self.df
+        terms = [self.vocabulary[token] for token in functions.analyze_tokens(tokens) if token in self.vocabulary]
+        terms = [term for term in terms if df[term] > 0]
+        counts = sp.csr_matrix((np.ones(len(terms)), (np.zeros(len(terms), dtype=int), terms)), shape=(1, len(self.terms)))
+        counts.sum_duplicates()
+        return functions.apply_weighting(functions.tfidf_base(counts, idf), idf, query_scheme)
+
+    def search(self, tokens, k=10, doc_scheme=('n', 't', 'c'), query_scheme=('n', 't', 'c')):
+        scores = (functions.l2_normalize(self.query_vector(tokens, query_scheme)) @ self.document_vectors(doc_scheme).T).toarray().ravel()
+        top = np.argsort(-scores, kind='stable')[:k]
+        return [(self.keys[position], float(scores[position])) for position in top if scores[position] > 0]
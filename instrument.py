@@ -0,0 +1,164 @@
+import cProfile
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import nullcontext
+
+# Everything below is a no-op until enable() is called; a disabled stage costs one global lookup
+_enabled = False
+_profile = False
+_memory = False
+_lock = threading.Lock()
+_local = threading.local()
+_stats = {}
+_counters = {}
+_events = []
+_profiles = {}
+_origin = time.perf_counter()
+_NULL = nullcontext()
+
+def enable(profile=False, memory=False):
+    # profile: one cProfile per outermost stage name; memory: tracemalloc peak per outermost stage
+    global _enabled, _profile, _memory
+    reset()
+    _enabled, _profile, _memory = True, profile, memory
+    if memory:
+        tracemalloc.start()
+
+def disable():
+    global _enabled
+    _enabled = False
+    if _memory and tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+def enabled():
+    return _enabled
+
+def reset():
+    global _origin
+    with _lock:
+        _stats.clear()
+        _counters.clear()
+        _events.clear()
+        _profiles.clear()
+    _origin = time.perf_counter()
+
+def _record(name, seconds, peak=None):
+    with _lock:
+        entry = _stats.get(name)
+        if entry is None:
+            entry = _stats[name] = {"count": 0, "seconds": 0.0, "max_seconds": 0.0}
+        entry["count"] += 1
+        entry["seconds"] += seconds
+        entry["max_seconds"] = max(entry["max_seconds"], seconds)
+        if peak is not None:
+            entry["peak_alloc_bytes"] = max(entry.get("peak_alloc_bytes", 0), peak)
+
+class _Stage:
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        depth = getattr(_local, "depth", 0)
+        _local.depth = depth + 1
+        # Profilers and the allocation peak cannot nest, so only the outermost stage of a thread owns them
+        self.outermost = depth == 0
+        self.profiler = None
+        if self.outermost and _profile:
+            with _lock:
+                profiler = _profiles.setdefault(self.name, cProfile.Profile())
+            try:
+                profiler.enable()
+                self.profiler = profiler
+            except ValueError:
+                # Python 3.12+ allows one active profiler per process; concurrent stages go unprofiled
+                pass
+        if self.outermost and _memory:
+            tracemalloc.reset_peak()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter()
+        if self.profiler is not None:
+            self.profiler.disable()
+        peak = tracemalloc.get_traced_memory()[1] if self.outermost and _memory else None
+        _local.depth -= 1
+        _record(self.name, end - self.start, peak)
+        event = {"name": self.name, "ph": "X", "ts": (self.start - _origin) * 1e6, "dur": (end - self.start) * 1e6,
+                 "pid": os.getpid(), "tid": threading.get_ident()}
+        if self.args:
+            event["args"] = self.args
+        with _lock:
+            _events.append(event)
+        return False
+
+def stage(name, **args):
+    # Timed span that is also emitted as a Chrome-trace event; use for coarse steps, not per-token work
+    if not _enabled:
+        return _NULL
+    return _Stage(name, args)
+
+def timed(name, fn=None):
+    # Aggregate-only timer for hot functions called per document: no trace event per call
+    def decorate(fn):
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                _record(name, time.perf_counter() - start)
+        wrapper.__name__ = fn.__name__
+        wrapper.__wrapped__ = fn
+        return wrapper
+    return decorate(fn) if fn is not None else decorate
+
+def timed_iter(name, iterable):
+    # Times each step of a generator, i.e. the reading and parsing it does, without the caller's work in between
+    if not _enabled:
+        return iterable
+    return _timed_iter(name, iterable)
+
+def _timed_iter(name, iterable):
+    iterator = iter(iterable)
+    while True:
+        start = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        _record(name, time.perf_counter() - start)
+        yield item
+
+def count(name, n=1):
+    if _enabled:
+        with _lock:
+            _counters[name] = _counters.get(name, 0) + n
+
+def report():
+    with _lock:
+        return {"stages": {name: dict(entry) for name, entry in _stats.items()}, "counters": dict(_counters)}
+
+def write_json(path):
+    with open(path, 'w') as file:
+        json.dump(report(), file, indent=2)
+
+def write_chrome_trace(path):
+    # Loadable in chrome://tracing or Perfetto
+    with _lock:
+        events = list(_events)
+    with open(path, 'w') as file:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, file)
+
+def write_profiles(directory):
+    # One .prof per outermost stage, for pstats or snakeviz
+    os.makedirs(directory, exist_ok=True)
+    with _lock:
+        profiles = dict(_profiles)
+    for name, profiler in profiles.items():
+        profiler.dump_stats(os.path.join(directory, name.replace(' ', '_').replace('/', '_') + ".prof"))
@@ -0,0 +1,122 @@
+import numpy as np
+
+import search
+
+CODECS = ("varint", "frame")
+
+def varint_encode(values):
+    # LEB128-style bytes, 7 bits per byte with the high bit set on every byte but the last of a value
+    values = np.asarray(values, dtype=np.uint64)
+    lengths = np.ones(len(values), dtype=np.int64)
+    for j in range(1, 5):
+        lengths += values >= (1 << (7 * j))
+    positions = np.arange(5)
+    chunks = ((values[:, None] >> (7 * positions).astype(np.uint64)) & 0x7f).astype(np.uint8)
+    chunks[positions < lengths[:, None] - 1] |= 0x80
+    return chunks[positions < lengths[:, None]], lengths
+
+def varint_decode(data):
+    data = np.asarray(data, dtype=np.uint8)
+    ends = np.flatnonzero(data < 0x80)
+    if len(ends) == len(data):
+        return data.astype(np.int64)
+    starts = np.empty_like(ends)
+    starts[0] = 0
+    starts[1:] = ends[:-1] + 1
+    values = (data & 0x7f).astype(np.int64)
+    np.left_shift(values, 7 * (np.arange(len(data)) - np.repeat(starts, ends - starts + 1)), out=values)
+    return np.add.reduceat(values, starts)
+
+def narrow(offsets):
+    # Offsets into the compressed streams rarely need more than 32 bits
+    return offsets.astype(np.uint32 if len(offsets) == 0 or offsets[-1] <= 0xffffffff else np.int64)
+
+def gaps(offsets, doc_ids):
+    # Delta gaps within each posting list; the first gap of a list is its first document id
+    deltas = np.diff(doc_ids, prepend=0).astype(np.int64)
+    firsts = offsets[:-1][np.diff(offsets) > 0]
+    deltas[firsts] = doc_ids[firsts]
+    return deltas
+
+class VarintPostings:
+    # Delta gaps of every posting list in one variable-byte stream
+    def __init__(self, offsets, doc_ids):
+        data, lengths = varint_encode(gaps(offsets, doc_ids))
+        self.data = data
+        self.byte_offsets = narrow(np.concatenate([[0], np.cumsum(lengths)])[offsets])
+        # Lists whose gaps all fit in one byte are stored as plain bytes and decode with a single cumsum
+        self.single_byte = np.diff(self.byte_offsets.astype(np.int64)) == np.diff(offsets)
+
+    @property
+    def nbytes(self):
+        return self.data.nbytes + self.byte_offsets.nbytes + self.single_byte.nbytes
+
+    def decode(self, term):
+        data = self.data[self.byte_offsets[term]:self.byte_offsets[term + 1]]
+        if self.single_byte[term]:
+            return data.astype(np.int64).cumsum()
+        return varint_decode(data).cumsum()
+
+class FramePostings:
+    # Frame of reference per posting list: a list's gaps are stored at the narrowest of 1, 2 or 4 bytes that holds its
+    # largest gap, in one array per width, so a whole list decodes with one slice and one cumsum
+    widths = (np.uint8, np.uint16, np.uint32)
+
+    def __init__(self, offsets, doc_ids):
+        deltas = gaps(offsets, doc_ids)
+        lengths = np.diff(offsets).astype(np.int64)
+        maxima = np.zeros(len(lengths), dtype=np.int64)
+        nonempty = lengths > 0
+        maxima[nonempty] = np.maximum.reduceat(deltas, offsets[:-1][nonempty])
+        self.codes = (maxima > 0xff).astype(np.int8) + (maxima > 0xffff)
+        posting_codes = np.repeat(self.codes, lengths)
+        # Lists keep their order within each width's array, so a list starts where the previous list of its width ends
+        self.streams = [deltas[posting_codes == code].astype(width) for code, width in enumerate(self.widths)]
+        starts = np.zeros(len(lengths), dtype=np.int64)
+        for code in range(len(self.widths)):
+            same = self.codes == code
+            starts[same] = np.cumsum(lengths[same]) - lengths[same]
+        self.starts = starts.astype(np.uint32 if len(deltas) <= 0xffffffff else np.int64)
+        self.offsets = offsets
+
+    @property
+    def nbytes(self):
+        # List lengths come from the index's own posting offsets, which CompressedIndex already counts
+        return sum(stream.nbytes for stream in self.streams) + self.starts.nbytes + self.codes.nbytes
+
+    def decode(self, term):
+        start = self.starts[term]
+        # Widening first and then summing is about twice as fast as np.cumsum(..., dtype=np.int64) on short lists
+        return self.streams[self.codes[term]][start:start + self.offsets[term + 1] - self.offsets[term]].astype(np.int64).cumsum()
+
+def quantize(offsets, weights, max_weights, bits):
+    # Each weight is stored as a fraction of its posting list's maximum, so the MaxScore bounds stay exact
+    levels = (1 << bits) - 1
+    scales = np.repeat(max_weights, np.diff(offsets))
+    scales[scales == 0] = 1
+    return np.rint(weights / scales * levels).astype(np.uint8 if bits <= 8 else np.uint16)
+
+class CompressedIndex(search.InvertedIndex):
+    # InvertedIndex whose postings are decoded per term at query time from compressed doc ids and quantized weights
+    def __init__(self, doc_vectors, codec="varint", weight_bits=8):
+        super().__init__(doc_vectors)
+        if codec == "varint":
+            self.postings = VarintPostings(self.offsets, self.doc_ids)
+        elif codec == "frame":
+            self.postings = FramePostings(self.offsets, self.doc_ids)
+        else:
+            raise ValueError(f"unknown codec {codec!r}, expected one of {CODECS}")
+        self.codec = codec
+        self.weight_bits = weight_bits
+        self.quantized = quantize(self.offsets, self.weights, self.max_weights, weight_bits)
+        self.levels = (1 << weight_bits) - 1
+        # The raw arrays are only needed to build the compressed ones
+        self.doc_ids = self.weights = None
+
+    @property
+    def nbytes(self):
+        return self.postings.nbytes + self.quantized.nbytes + self.offsets.nbytes + self.max_weights.nbytes
+
+    def posting(self, term):
+        start, end = self.offsets[term], self.offsets[term + 1]
+        return self.postings.decode(term), self.quantized[start:end] * (self.max_weights[term] / self.levels)
@@ -0,0 +1,229 @@
+import copy
+import hashlib
+import os
+import re
+
+import numpy as np
+import scipy.sparse as sp
+
+import functions
+import instrument
+import stopwords as stopword_lists
+
+DATA_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+class SmartReader:
+    # SMART-style collections where every record starts with '.I <id>' and fields are tagged .T/.A/.B/.W/...
+    separator = r'\.I \d+'
+    qrels_doc_column = 1
+
+    def parse_document(self, record):
+        raise NotImplementedError
+
+    def parse_query(self, record):
+        raise NotImplementedError
+
+    def iter_documents(self, filepath):
+        for record in functions.iter_records(filepath, self.separator):
+            yield self.parse_document(record)
+
+    def iter_queries(self, filepath):
+        for query in map(self.parse_query, functions.iter_records(filepath, self.separator)):
+            if query is not None:
+                yield query
+
+    def read_qrels(self, filepath):
+        qrels = {}
+        with open(filepath, 'r') as file:
+            for line in file:
+                parts = line.strip().split()
+                if not parts:
+                    continue
+                qid = int(parts[0])
+                did = int(parts[self.qrels_doc_column])
+                if qid not in qrels:
+                    qrels[qid] = set()
+                qrels[qid].add(did)
+        return qrels
+
+class CranReader(SmartReader):
+    def parse_document(self, record):
+        title = re.search(r'\.T\s+([\s\S]+?)\.(A|B|W|N|X)', record)
+        body = re.search(r'\.B\s+([\s\S]+?)\.(T|A|W|N|X)', record)
+        abstract = re.search(r'\.W\s+([\s\S]+?)\.(T|A|B|N|X|$)', record)
+        text = (title.group(1) if title else '') + ' ' + \
+               (body.group(1) if body else '') + ' ' + \
+               (abstract.group(1) if abstract else '')
+        return text.replace('\n', ' ').strip()
+
+    def parse_query(self, record):
+        text = re.search(r'\.W\s+([\s\S]+?)(?=\.I|$)', record)  # Look ahead to find the next .I or end of string
+        if text:
+            return text.group(1).replace('\n', ' ').strip()
+        return None
+
+class MedReader(SmartReader):
+    # MED has only .I and .W, so the entire .W text is the document or query; judgments are 'qid 0 did 1'
+    qrels_doc_column = 2
+
+    def parse_document(self, record):
+        text = re.search(r'\.W\s+([\s\S]+?)(\.I|$)', record)
+        return (text.group(1) if text else '').strip()
+
+    def parse_query(self, record):
+        return self.parse_document(record)
+
+class CacmReader(SmartReader):
+    def parse_document(self, record):
+        title = re.search(r'\.T\s+([\s\S]+?)\.B', record)
+        body = re.search(r'\.B\s+([\s\S]+?)(\.A|\.N|\.X|$)', record)
+        text = (title.group(1) if title else '') + ' ' + (body.group(1) if body else '')
+        return text.strip()
+
+    def parse_query(self, record):
+        text = re.search(r'\.W\s+([\s\S]+?)(\.N|$)', record)
+        return (text.group(1) if text else '').strip()
+
+class NplReader:
+    # Every NPL file is a sequence of '/'-terminated entries
+    def iter_entries(self, filepath):
+        for entry in functions.iter_records(filepath, r'/', skip_first=False):
+            entry = entry.strip()
+            if entry:
+                yield entry
+
+    def iter_documents(self, filepath):
+        return self.iter_entries(filepath)
+
+    def iter_queries(self, filepath):
+        return self.iter_entries(filepath)
+
+    def read_qrels(self, filepath):
+        # The n-th entry lists the relevant document ids of query n
+        return {qid: set(map(int, entry.split())) for qid, entry in enumerate(self.iter_entries(filepath), start=1)}
+
+    def read_vectors(self, filepath, n_terms=None):
+        # doc-vecs/query-vec entries are '<id> <term id> <term id> ...', 1-based ids into term-vocab
+        rows, cols = [], []
+        # The vector files end in NUL padding rather than another entry
+        entries = [entry for entry in self.iter_entries(filepath) if entry.strip('\x00')]
+        for row, entry in enumerate(entries):
+            terms = [int(term) - 1 for term in entry.split()[1:]]
+            rows.extend([row] * len(terms))
+            cols.extend(terms)
+        n_terms = n_terms or max(cols) + 1
+        return sp.csr_matrix((np.ones(len(rows)), (rows, cols)), shape=(len(entries), n_terms))
+
+class TimeReader:
+    def iter_documents(self, filepath):
+        for record in functions.iter_records(filepath, r'\*TEXT \d+'):
+            text = re.search(r'PAGE \d+\n\n([\s\S]+?)(?=\*TEXT|$)', record)
+            yield (text.group(1) if text else '').strip()
+
+    def iter_queries(self, filepath):
+        # Each record starts right after the *FIND number, where the query text follows a blank line
+        for record in functions.iter_records(filepath, r'\*FIND\s+\d+'):
+            text = re.match(r'\n\n([\s\S]+?)$', record)
+            if text:
+                yield text.group(1).strip()
+
+    def read_qrels(self, filepath):
+        qrels = {}
+        with open(filepath, 'r') as file:
+            for line in file:
+                parts = line.strip().split()
+                if len(parts) < 2:
+                    continue  # Skip lines with insufficient data
+                qid = int(parts[0])
+                if qid not in qrels:
+                    qrels[qid] = set()
+                qrels[qid].update(map(int, parts[1:]))
+        return qrels
+
+def parser_fingerprint(reader):
+    # Hash of the reader's parsing code and settings, so an edited parser invalidates every index and score built with it
+    import inspect
+    digest = hashlib.sha256(inspect.getsource(functions.iter_records).encode())
+    cls = type(reader)
+    for name in sorted(dir(cls)):
+        if name.startswith('__'):
+            continue
+        value = getattr(cls, name)
+        if inspect.isfunction(value):
+            try:
+                text = inspect.getsource(value)
+            except OSError:
+                # Functions defined without a source file, e.g. in an interactive session
+                text = value.__code__.co_code.hex() + repr(value.__code__.co_consts)
+        else:
+            text = repr(value)
+        digest.update(f"{name}\0{text}\0".encode())
+    return digest.hexdigest()
+
+class Dataset:
+    def __init__(self, name, reader, documents, queries, qrels, stopwords=None, vectors=None):
+        self.name = name
+        # Optional (documents, queries) files of precomputed vectors, read by the reader's read_vectors
+        self.vectors = vectors
+        self.reader = reader
+        self.documents = documents
+        self.queries = queries
+        self.qrels_path = qrels
+        # Name of a list in stopwords.LISTS, or None
+        self.stopwords = stopwords
+
+    def path(self, filepath):
+        return os.path.join(DATA_ROOT, filepath)
+
+    def parser_fingerprint(self):
+        return parser_fingerprint(self.reader)
+
+    def sources(self):
+        sources = [self.path(filepath) for filepath in (self.documents, self.queries)]
+        if self.stopwords:
+            sources.append(stopword_lists.path(self.stopwords))
+        return sources
+
+    def with_stopwords(self, name):
+        # The same collection filtered with another bundled list ('' for none)
+        dataset = copy.copy(self)
+        dataset.stopwords = name or None
+        return dataset
+
+    def iter_documents(self):
+        return instrument.timed_iter("parse documents", self.reader.iter_documents(self.path(self.documents)))
+
+    def iter_queries(self):
+        return instrument.timed_iter("parse queries", self.reader.iter_queries(self.path(self.queries)))
+
+    def read_stopwords(self):
+        return stopword_lists.load(self.stopwords)
+
+    def read_collection(self):
+        # Documents and queries are generators, so each text is tokenized as it is parsed
+        return self.iter_documents(), self.iter_queries(), self.read_stopwords()
+
+    def read_vectors(self, n_terms=None):
+        documents, queries = self.vectors
+        doc_vectors = self.reader.read_vectors(self.path(documents), n_terms)
+        query_vectors = self.reader.read_vectors(self.path(queries), n_terms)
+        n_terms = max(doc_vectors.shape[1], query_vectors.shape[1])
+        doc_vectors.resize(doc_vectors.shape[0], n_terms)
+        query_vectors.resize(query_vectors.shape[0], n_terms)
+        return doc_vectors, query_vectors
+
+    def qrels(self):
+        return self.reader.read_qrels(self.path(self.qrels_path))
+
+DATASETS = {}
+
+def register(dataset):
+    DATASETS[dataset.name] = dataset
+    return dataset
+
+register(Dataset("cran", CranReader(), "cran/cran.all.1400", "cran/cran.qry", "cran/cranqrel"))
+# npl/term-vocab is NPL's indexing vocabulary rather than a stopword list; it only ever matched nothing because it is upper case
+register(Dataset("npl", NplReader(), "npl/doc-text", "npl/query-text", "npl/rlv-ass", vectors=("npl/doc-vecs", "npl/query-vec")))
+register(Dataset("cacm", CacmReader(), "cacm/cacm.all", "cacm/query.text", "cacm/qrels.text", stopwords="cacm"))
+register(Dataset("med", MedReader(), "med/MED.ALL", "med/MED.QRY", "med/MED.REL"))
+register(Dataset("time", TimeReader(), "time/TIME.ALL", "time/TIME.QUE", "time/TIME.REL", stopwords="time"))
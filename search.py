@@ -0,0 +1,185 @@
+import argparse
+import heapq
+import sys
+
+import numpy as np
+import scipy.sparse as sp
+
+import functions
+import indexing
+from readers import DATASETS
+
+def scheme_vectorizer(texts, scheme, **kwargs):
+    # Texts may be preprocessed strings or token lists, as with functions.term_vectorizer
+    if texts and not isinstance(texts[0], str):
+        kwargs.setdefault("analyzer", functions.analyze_tokens)
+    return functions.CustomTfidfVectorizer(tf_method=scheme[0], idf_method=scheme[1], normalization=scheme[2], **kwargs)
+
+class InvertedIndex:
+    # Term-at-a-time cosine scoring over per-term posting lists built from unit-length document vectors
+    def __init__(self, doc_vectors):
+        postings = functions.l2_normalize(sp.csr_matrix(doc_vectors)).tocsc()
+        postings.sort_indices()
+        self.n_docs, self.n_terms = postings.shape
+        self.offsets = postings.indptr
+        self.doc_ids = postings.indices
+        self.weights = postings.data
+        # Largest weight in each posting list, the per-term score bound MaxScore needs
+        self.max_weights = np.zeros(self.n_terms)
+        nonempty = np.diff(self.offsets) > 0
+        self.max_weights[nonempty] = np.maximum.reduceat(self.weights, self.offsets[:-1][nonempty])
+        self._accumulator = np.zeros(self.n_docs)
+        self._is_candidate = np.zeros(self.n_docs, dtype=bool)
+        self._candidates = np.empty(self.n_docs, dtype=np.int64)
+
+    @classmethod
+    def from_documents(cls, documents, doc_scheme):
+        vectorizer = scheme_vectorizer(documents, doc_scheme)
+        index = cls(vectorizer.fit_transform(documents))
+        index.vectorizer = vectorizer
+        return index
+
+    def posting(self, term):
+        start, end = self.offsets[term], self.offsets[term + 1]
+        return self.doc_ids[start:end], self.weights[start:end]
+
+    def search(self, query_vector, k=10, prune=False):
+        # Returns [(doc_idx, score), ...] best first; without pruning, scored exactly like cosine_similarity
+        query_units = functions.l2_normalize(sp.csr_matrix(query_vector))
+        return self._search(query_units.indices, query_units.data, k, prune)
+
+    def _search(self, terms, query_weights, k, prune):
+        # query_weights are already unit length, normalized by l2_normalize like the document side
+        if not np.any(query_weights):
+            return []
+        accumulator = self._accumulator
+        candidates = self._candidates
+        essential = len(terms)
+        if prune:
+            bounds = query_weights * self.max_weights[terms]
+            order = np.argsort(-bounds, kind='stable')
+            terms, query_weights, bounds = terms[order], query_weights[order], bounds[order]
+            n_candidates, essential = self._accumulate_maxscore(terms, query_weights, bounds, k)
+        else:
+            # Terms are added in the query's column order, the order the sparse product sums them in
+            n_candidates = 0
+            for term, weight in zip(terms, query_weights):
+                docs, doc_weights = self.posting(term)
+                accumulator[docs] += weight * doc_weights
+                n_candidates = self._add_candidates(docs, n_candidates)
+        candidates = candidates[:n_candidates].copy()
+        is_candidate = self._is_candidate
+
+        # Non-essential terms can no longer introduce a document, only add to existing candidates: by binary search
+        # when the candidates are few next to the posting list, otherwise by masking the posting list
+        for term, weight in zip(terms[essential:], query_weights[essential:]):
+            docs, doc_weights = self.posting(term)
+            if len(docs) == 0:
+                continue
+            if len(candidates) * 8 < len(docs):
+                positions = np.minimum(np.searchsorted(docs, candidates), len(docs) - 1)
+                matched = docs[positions] == candidates
+                accumulator[candidates[matched]] += weight * doc_weights[positions[matched]]
+            else:
+                matched = is_candidate[docs]
+                accumulator[docs[matched]] += weight * doc_weights[matched]
+        is_candidate[candidates] = False
+
+        scores = accumulator[candidates]
+        accumulator[candidates] = 0
+        if len(candidates) > k:
+            # Only documents tied with or above the k-th score go through the heap
+            keep = scores >= np.partition(scores, -k)[-k]
+            scores, candidates = scores[keep], candidates[keep]
+        best = heapq.nlargest(k, zip(scores.tolist(), (-candidates).tolist()))
+        return [(-doc, score) for score, doc in best]
+
+    def _add_candidates(self, docs, n_candidates):
+        # Candidates are appended to a reusable buffer as they are first seen, so no step re-deduplicates the ones before
+        new = docs[~self._is_candidate[docs]]
+        self._is_candidate[new] = True
+        self._candidates[n_candidates:n_candidates + len(new)] = new
+        return n_candidates + len(new)
+
+    def _accumulate_maxscore(self, terms, query_weights, bounds, k):
+        accumulator = self._accumulator
+        remaining = np.concatenate([np.cumsum(bounds[::-1])[::-1][1:], [0.0]])
+        best = 0.0
+        n_candidates = 0
+        for i, (term, weight) in enumerate(zip(terms, query_weights)):
+            docs, doc_weights = self.posting(term)
+            accumulator[docs] += weight * doc_weights
+            n_candidates = self._add_candidates(docs, n_candidates)
+            if i + 1 == len(terms) or len(docs) == 0:
+                continue
+            # The best partial score bounds the k-th from above, so most steps skip the exact check
+            best = max(best, accumulator[docs].max())
+            if remaining[i] >= best or n_candidates < k:
+                continue
+            # Partial scores only grow, so the current k-th best is a lower bound on the final threshold
+            threshold = np.partition(accumulator[self._candidates[:n_candidates]], -k)[-k]
+            if remaining[i] < threshold:
+                return n_candidates, i + 1
+        return n_candidates, len(terms)
+
+    def search_batch(self, query_vectors, k=10, prune=False):
+        query_units = functions.l2_normalize(sp.csr_matrix(query_vectors))
+        offsets = query_units.indptr
+        return [self._search(query_units.indices[start:end], query_units.data[start:end], k, prune)
+                for start, end in zip(offsets[:-1], offsets[1:])]
+
+def row_top_k(scores, row, k):
+    # Best k of one row of a sparse score matrix, highest score first and ties by document index; zero scores never rank
+    start, end = scores.indptr[row], scores.indptr[row + 1]
+    docs, values = scores.indices[start:end], scores.data[start:end]
+    if len(values) > k:
+        # Keep every document tied with the k-th score, so which ties make the cut does not depend on argpartition
+        keep = values >= values[np.argpartition(-values, k - 1)[k - 1]]
+        docs, values = docs[keep], values[keep]
+    order = np.lexsort((docs, -values))[:k]
+    return docs[order], values[order]
+
+def iter_top_k(query_vectors, doc_vectors, k=1000, block_size=256):
+    # Streams (query_idx, doc_idx, score, rank) best first per query, scoring block_size queries per sparse product,
+    # so memory is bounded by one block's scores rather than the full query x document matrix
+    query_units = functions.l2_normalize(sp.csr_matrix(query_vectors))
+    doc_units_t = functions.l2_normalize(sp.csr_matrix(doc_vectors)).T.tocsr()
+    for first in range(0, query_units.shape[0], block_size):
+        scores = (query_units[first:first + block_size] @ doc_units_t).tocsr()
+        for row in range(scores.shape[0]):
+            docs, values = row_top_k(scores, row, k)
+            for rank, (doc, score) in enumerate(zip(docs.tolist(), values.tolist()), start=1):
+                yield first + row, doc, score, rank
+
+def write_trec_run(results, file, run_id="tfidf", query_ids=None, doc_ids=None):
+    # 'qid Q0 docno rank score run_id' lines, as trec_eval reads them; ids default to the 1-based ones in the qrels files
+    for query, doc, score, rank in results:
+        qid = query_ids[query] if query_ids is not None else query + 1
+        docno = doc_ids[doc] if doc_ids is not None else doc + 1
+        file.write(f"{qid} Q0 {docno} {rank} {score:.6f} {run_id}\n")
+
+def retrieve(documents, queries, doc_scheme, query_scheme, k=10, prune=False):
+    # Ranked counterpart of compute_tfidf_and_similarity
+    index = InvertedIndex.from_documents(documents, doc_scheme)
+    query_vectorizer = scheme_vectorizer(queries, query_scheme, vocabulary=index.vectorizer.vocabulary_)
+    return index.search_batch(query_vectorizer.fit_transform(queries), k=k, prune=prune)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Top-k retrieval over one dataset's index, written as a TREC run file")
+    parser.add_argument("dataset", choices=list(DATASETS))
+    parser.add_argument("--scheme", default="ltc.ltc", help="document.query weighting scheme")
+    parser.add_argument("--stemming", action="store_true")
+    parser.add_argument("-k", type=int, default=1000)
+    parser.add_argument("--block-size", type=int, default=256, help="queries scored per sparse product")
+    parser.add_argument("--run-id")
+    parser.add_argument("--output", help="run file path (default: stdout)")
+    args = parser.parse_args()
+    scheme = tuple(args.scheme.replace('.', ''))
+    sweep = indexing.dataset_index(DATASETS[args.dataset], args.stemming).sweep()
+    results = iter_top_k(sweep.query_vectors(scheme[3:]), sweep.document_vectors(scheme[:3]), args.k, args.block_size)
+    run_id = args.run_id or f"{args.dataset}-{args.scheme}"
+    if args.output:
+        with open(args.output, 'w') as file:
+            write_trec_run(results, file, run_id)
+    else:
+        write_trec_run(results, sys.stdout, run_id)
@@ -0,0 +1,215 @@
+import argparse
+import asyncio
+import json
+import sys
+import time
+from collections import deque
+
+import numpy as np
+import scipy.sparse as sp
+
+import functions
+import indexing
+import search
+from readers import DATASETS
+
+class SearchService:
+    # Keeps one dataset's weighted document matrix resident and scores ad-hoc queries against it
+    def __init__(self, dataset_name, stemming=False, doc_scheme=('n', 't', 'c'), query_scheme=('n', 't', 'c')):
+        dataset = DATASETS[dataset_name]
+        self.index = indexing.dataset_index(dataset, stemming)
+        self.stemming = stemming
+        self.query_scheme = query_scheme
+        self.preprocessor = functions.Preprocessor(dataset.read_stopwords())
+        self.vocabulary = self.index.vocabulary
+        doc_idf = np.asarray(self.index.doc_idf)
+        self.idf = doc_idf
+        doc_vectors = functions.apply_weighting(functions.tfidf_base(self.index.doc_counts, doc_idf), doc_idf, doc_scheme)
+        self.doc_units_t = functions.l2_normalize(doc_vectors).T.tocsr()
+        self.latencies = deque(maxlen=100000)
+
+    def query_vectors(self, queries):
+        # Ad-hoc queries have no query collection to fit IDF on, so they are weighted with the document IDF
+        rows, cols = [], []
+        for row, query in enumerate(queries):
+            for token in functions.analyze_tokens(self.preprocessor.process(query, stemming=self.stemming)):
+                term = self.vocabulary.get(token)
+                if term is not None:
+                    rows.append(row)
+                    cols.append(term)
+        counts = sp.csr_matrix((np.ones(len(rows)), (rows, cols)), shape=(len(queries), len(self.idf)))
+        counts.sum_duplicates()
+        return functions.apply_weighting(functions.tfidf_base(counts, self.idf), self.idf, self.query_scheme)
+
+    def search_batch(self, queries, ks):
+        # One sparse product for the whole batch, then top-k over each row's non-zero scores
+        scores = functions.l2_normalize(self.query_vectors(queries)) @ self.doc_units_t
+        scores = scores.tocsr()
+        results = []
+        for row, k in enumerate(ks):
+            docs, values = search.row_top_k(scores, row, k)
+            # Document ids are 1-based, as in the qrels files
+            results.append([{"doc": int(doc) + 1, "score": float(value)} for doc, value in zip(docs, values)])
+        return results
+
+    def stats(self):
+        if not self.latencies:
+            return {"requests": 0}
+        latencies = np.array(self.latencies) * 1e3
+        return {"requests": len(latencies), "p50_ms": float(np.percentile(latencies, 50)),
+                "p99_ms": float(np.percentile(latencies, 99)), "max_ms": float(latencies.max())}
+
+class MicroBatcher:
+    # Collects concurrent requests for up to max_delay seconds (or max_batch requests) and scores them together
+    def __init__(self, service, max_batch=64, max_delay=0.002):
+        self.service = service
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.queue = asyncio.Queue()
+
+    async def search(self, query, k=10):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((query, k, future, time.perf_counter()))
+        return await future
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.max_delay
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            queries = [query for query, _, _, _ in batch]
+            ks = [k for _, k, _, _ in batch]
+            try:
+                results = await loop.run_in_executor(None, self.service.search_batch, queries, ks)
+            except Exception:
+                # Score the batch one request at a time, so a failure only reaches the request that caused it
+                results = []
+                for query, k, _, _ in batch:
+                    try:
+                        results.extend(await loop.run_in_executor(None, self.service.search_batch, [query], [k]))
+                    except Exception as error:
+                        results.append(error)
+            finished = time.perf_counter()
+            for (_, _, future, started), result in zip(batch, results):
+                if future.done():
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    self.service.latencies.append(finished - started)
+                    future.set_result(result)
+
+def parse_request(request):
+    # Rejects malformed requests before they are queued, where they would share a batch with valid ones
+    if not isinstance(request, dict):
+        raise ValueError("request must be a JSON object")
+    if request.get("stats"):
+        return None, None
+    query, k = request.get("query"), request.get("k", 10)
+    if not isinstance(query, str):
+        raise ValueError("query must be a string")
+    if isinstance(k, bool) or not isinstance(k, int) or k <= 0:
+        raise ValueError("k must be a positive integer")
+    return query, k
+
+async def handle_request(batcher, request):
+    query, k = parse_request(request)
+    if query is None:
+        response = batcher.service.stats()
+    else:
+        response = {"results": await batcher.search(query, k)}
+    if "id" in request:
+        response["id"] = request["id"]
+    return response
+
+async def handle_http(batcher, reader, writer):
+    # Just enough HTTP/1.1 for POST /search {"query": ..., "k": ...} and GET /stats
+    try:
+        request_line = (await reader.readline()).decode().split()
+        headers = {}
+        while True:
+            line = (await reader.readline()).decode().strip()
+            if not line:
+                break
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+        body = await reader.readexactly(int(headers.get("content-length", 0)))
+        if len(request_line) >= 2 and request_line[1] == "/stats":
+            status, payload = "200 OK", batcher.service.stats()
+        elif len(request_line) >= 2 and request_line[0] == "POST" and request_line[1] == "/search":
+            status, payload = "200 OK", await handle_request(batcher, json.loads(body))
+        else:
+            status, payload = "404 Not Found", {"error": "use POST /search or GET /stats"}
+    except (ValueError, KeyError) as error:
+        status, payload = "400 Bad Request", {"error": str(error)}
+    except Exception as error:
+        # A failure while scoring still gets a reply instead of a dropped connection
+        status, payload = "500 Internal Server Error", {"error": f"{type(error).__name__}: {error}"}
+    data = json.dumps(payload).encode()
+    writer.write(f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\nContent-Length: {len(data)}\r\nConnection: close\r\n\r\n".encode() + data)
+    await writer.drain()
+    writer.close()
+
+async def serve_stdin(batcher):
+    # One JSON request per line in, one JSON response per line out as soon as it is scored; an "id" field is echoed back
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader()
+    await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+    pending = set()
+    while True:
+        line = await reader.readline()
+        if not line:
+            break
+        if line.strip():
+            task = asyncio.ensure_future(respond(batcher, line))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+    if pending:
+        await asyncio.wait(pending)
+
+async def respond(batcher, line):
+    request = None
+    try:
+        request = json.loads(line)
+        response = await handle_request(batcher, request)
+    except (ValueError, KeyError) as error:
+        response = {"error": str(error)}
+    except Exception as error:
+        response = {"error": f"{type(error).__name__}: {error}"}
+    if "error" in response and isinstance(request, dict) and "id" in request:
+        response["id"] = request["id"]
+    print(json.dumps(response), flush=True)
+
+async def main(args):
+    service = SearchService(args.dataset, args.stemming, tuple(args.doc_scheme), tuple(args.query_scheme))
+    batcher = MicroBatcher(service, args.max_batch, args.max_delay / 1e3)
+    batch_task = asyncio.ensure_future(batcher.run())
+    if args.port is None:
+        await serve_stdin(batcher)
+        print(json.dumps(service.stats()), file=sys.stderr)
+    else:
+        server = await asyncio.start_server(lambda reader, writer: handle_http(batcher, reader, writer), args.host, args.port)
+        print(f"Serving {args.dataset.upper()} on http://{args.host}:{args.port}", file=sys.stderr, flush=True)
+        async with server:
+            await server.serve_forever()
+    batch_task.cancel()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Resident search service over one dataset's document matrix")
+    parser.add_argument("dataset", choices=list(DATASETS))
+    parser.add_argument("--stemming", action="store_true")
+    parser.add_argument("--doc-scheme", default="ntc")
+    parser.add_argument("--query-scheme", default="ntc")
+    parser.add_argument("--port", type=int, help="serve HTTP on this port instead of JSON lines on stdin")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--max-batch", type=int, default=64)
+    parser.add_argument("--max-delay", type=float, default=2.0, help="milliseconds to wait for a batch to fill")
+    asyncio.run(main(parser.parse_args()))
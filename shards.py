@@ -0,0 +1,112 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import scipy.sparse as sp
+
+import functions
+import search
+
+def shard_bounds(n_docs, n_shards):
+    # Contiguous document ranges, so a shard's local row plus its offset is the global document index
+    return np.linspace(0, n_docs, n_shards + 1).astype(int)
+
+def merge_top_k(candidates, k):
+    # Per-shard top-k lists merged exactly like search.row_top_k orders one unsharded row
+    docs = np.concatenate([docs for docs, _ in candidates])
+    values = np.concatenate([values for _, values in candidates])
+    order = np.lexsort((docs, -values))[:k]
+    return docs[order], values[order]
+
+def _serve_shard(connection, directory, shard, offset, doc_scheme):
+    # Each shard weights its own rows with the global IDF; every weighting step is row-local, so the rows come out
+    # exactly as they would from the full matrix
+    counts = functions.load_csr(os.path.join(directory, f"shard{shard}"))
+    idf = np.load(os.path.join(directory, "idf.npy"))
+    doc_units_t = functions.l2_normalize(functions.apply_weighting(functions.tfidf_base(counts, idf), idf, doc_scheme)).T.tocsr()
+    del counts
+    connection.send(doc_units_t.shape[1])
+    while True:
+        message = connection.recv()
+        if message is None:
+            break
+        query_units, k = message
+        scores = (query_units @ doc_units_t).tocsr()
+        top = [search.row_top_k(scores, row, k) for row in range(scores.shape[0])]
+        connection.send([(docs.astype(np.int64) + offset, values) for docs, values in top])
+    connection.close()
+
+class ShardedIndex:
+    # Coordinator for n_shards worker processes that each hold a slice of the weighted document matrix.
+    # A query batch is sent to every shard at once and the per-shard top-k lists are merged as they come back.
+    def __init__(self, doc_counts, n_shards=2, doc_scheme=('n', 't', 'c')):
+        doc_counts = sp.csr_matrix(doc_counts)
+        self.n_docs = doc_counts.shape[0]
+        self.bounds = shard_bounds(self.n_docs, n_shards)
+        self.doc_idf = functions.smooth_idf(doc_counts)
+        self._directory = tempfile.mkdtemp(prefix="shards-")
+        np.save(os.path.join(self._directory, "idf.npy"), self.doc_idf)
+        self.connections = []
+        self.processes = []
+        try:
+            for shard, (start, end) in enumerate(zip(self.bounds[:-1], self.bounds[1:])):
+                functions.save_csr(os.path.join(self._directory, f"shard{shard}"), doc_counts[start:end])
+                parent, child = multiprocessing.Pipe()
+                process = multiprocessing.Process(target=_serve_shard, args=(child, self._directory, shard, int(start), tuple(doc_scheme)),
+                                                  daemon=True)
+                process.start()
+                child.close()
+                self.connections.append(parent)
+                self.processes.append(process)
+            self.shard_sizes = [connection.recv() for connection in self.connections]
+        except BaseException:
+            self.close()
+            raise
+        # Every shard has built its matrix, so the scratch slices are no longer needed
+        shutil.rmtree(self._directory, ignore_errors=True)
+
+    @classmethod
+    def from_term_index(cls, term_index, n_shards=2, doc_scheme=('n', 't', 'c')):
+        return cls(term_index.doc_counts, n_shards, doc_scheme)
+
+    @property
+    def n_shards(self):
+        return len(self.connections)
+
+    def search_batch(self, query_vectors, k=10):
+        # Returns one (doc_indices, scores) pair per query, best first, identical to the unsharded search.iter_top_k
+        query_units = functions.l2_normalize(sp.csr_matrix(query_vectors))
+        for connection in self.connections:
+            connection.send((query_units, k))
+        per_shard = [connection.recv() for connection in self.connections]
+        return [merge_top_k([shard[row] for shard in per_shard], k) for row in range(query_units.shape[0])]
+
+    def iter_top_k(self, query_vectors, k=1000, block_size=256):
+        # Same (query_idx, doc_idx, score, rank) stream as search.iter_top_k
+        query_vectors = sp.csr_matrix(query_vectors)
+        for first in range(0, query_vectors.shape[0], block_size):
+            for row, (docs, values) in enumerate(self.search_batch(query_vectors[first:first + block_size], k)):
+                for rank, (doc, score) in enumerate(zip(docs.tolist(), values.tolist()), start=1):
+                    yield first + row, doc, score, rank
+
+    def close(self):
+        for connection in self.connections:
+            try:
+                connection.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+        for process in self.processes:
+            process.join()
+        for connection in self.connections:
+            connection.close()
+        self.connections, self.processes = [], []
+        shutil.rmtree(self._directory, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
@@ -0,0 +1,39 @@
+import os
+import re
+from functools import lru_cache
+
+import numpy as np
+
+import functions
+
+STOPWORD_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+def parse_words(content):
+    # One word per line, blank lines allowed (cacm/common_words, time/TIME.STP)
+    return content.split()
+
+def parse_term_vocab(content):
+    # '/'-terminated '<id> <term>' entries (npl/term-vocab)
+    return [re.sub(r'^\d+\s*', '', term.strip()) for term in content.split('/') if term.strip()]
+
+# Every bundled list, by the collection it ships with; any dataset may use any of them
+LISTS = {
+    "cacm": ("cacm/common_words", parse_words),
+    "time": ("time/TIME.STP", parse_words),
+    "npl": ("npl/term-vocab", parse_term_vocab),
+}
+
+def path(name):
+    return os.path.join(STOPWORD_ROOT, LISTS[name][0])
+
+@lru_cache(maxsize=None)
+def load(name):
+    # Lower-cased like the tokens they are matched against, and loaded once however many datasets share them
+    if not name:
+        return frozenset()
+    parse = LISTS[name][1]
+    return frozenset(word.lower() for word in parse(functions.read_file(path(name))))
+
+def term_mask(terms, stopwords):
+    # One set lookup per distinct term instead of per token; True marks the ids to drop
+    return np.array([term in stopwords for term in terms], dtype=bool)
@@ -0,0 +1,153 @@
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+import cache
+import functions
+import indexing
+import instrument
+import stopwords
+from readers import DATASETS
+
+STEMMING_MODES = {"off": [False], "on": [True], "both": [False, True]}
+
+def parse_scheme(text):
+    # 'ltc.nnn' -> ('l', 't', 'c', 'n', 'n', 'n')
+    scheme = tuple(text.replace('.', ''))
+    if len(scheme) != 6:
+        raise argparse.ArgumentTypeError(f"expected a document.query scheme such as ltc.nnn, got {text!r}")
+    return scheme
+
+def run_dataset(dataset, stemming_modes, *, schemes, workers=1, stem=None, results_cache=None, cache_similarities=False,
+                precision="float64", ingest_workers=1):
+    with instrument.stage("dataset " + dataset.name):
+        return _run_dataset(dataset, stemming_modes, schemes=schemes, workers=workers, stem=stem, results_cache=results_cache,
+                            cache_similarities=cache_similarities, precision=precision, ingest_workers=ingest_workers)
+
+def _run_dataset(dataset, stemming_modes, *, schemes, workers, stem, results_cache, cache_similarities, precision, ingest_workers):
+    print(f"Processing {dataset.name.upper()} dataset...", flush=True)
+    # Only the judgments are read every run; the collection itself is served from the index
+    qrels = dataset.qrels()
+    collection = indexing.LazyCollection(dataset.read_collection, stem=stem, workers=ingest_workers)
+    if results_cache is not None:
+        sources = cache.content_hashes(dataset.sources())
+        judgments = cache.content_hashes([dataset.path(dataset.qrels_path)])
+
+    results = []
+    for stemming in stemming_modes:
+        options = dict(indexing.index_options(dataset, stemming), version=indexing.FORMAT_VERSION, precision=precision)
+        scores = {}
+        if results_cache is not None:
+            # Scores are keyed by the content of every input, so an edited file or option only misses its own entries
+            keys = {scheme: cache.cache_key("map", sources, judgments, options, scheme) for scheme in schemes}
+            for scheme in schemes:
+                map_score = results_cache.score(keys[scheme])
+                if map_score is not None:
+                    scores[scheme] = map_score
+        missing = [scheme for scheme in schemes if scheme not in scores]
+        instrument.count("cached schemes", len(schemes) - len(missing))
+
+        if missing:
+            # Reuse the on-disk index for this stemming mode unless a source file or the options changed
+            ingested = collection.ingest_stats
+            term_index = indexing.dataset_index(dataset, stemming, collection)
+            if ingested is None and collection.ingest_stats is not None:
+                stats = collection.ingest_stats
+                print(f"Ingested {stats['documents']} {dataset.name.upper()} documents in {stats['seconds']:.2f}s "
+                      f"({stats['docs_per_second']:.0f} docs/s, {stats['workers']} worker{'s' if stats['workers'] > 1 else ''})", flush=True)
+
+            # Derive every scheme from the cached count matrices
+            sweep = term_index.sweep(precision)
+            if cache_similarities:
+                relevance = functions.relevance_matrix(qrels, term_index.query_counts.shape[0], term_index.doc_counts.shape[0])
+                for scheme in missing:
+                    similarities = results_cache.array(cache.cache_key("similarities", sources, options, scheme),
+                                                       lambda: sweep.similarities(scheme[:3], scheme[3:]))
+                    scores[scheme] = functions.calculate_map(similarities, qrels, relevance=relevance)
+            else:
+                scores.update((scheme, map_score) for map_score, scheme in sweep.run(missing, qrels, workers=workers))
+            if results_cache is not None:
+                for scheme in missing:
+                    results_cache.put_score(keys[scheme], scores[scheme])
+
+        for scheme in schemes:
+            results.append((scores[scheme], scheme, dataset.name, "stemming" if stemming else "no stemming"))
+    return results
+
+def run(names, stemming_modes=(False, True), *, schemes=None, workers=1, concurrent=1, results_cache=None, cache_similarities=False,
+        stopword_list=None, precision="float64", ingest_workers=1):
+    schemes = schemes or functions.weighting_schemes()
+    # Every dataset stems through the same memo, so shared vocabulary is only stemmed once; the stemmer (and NLTK)
+    # is only created if some index actually has to be rebuilt
+    shared = functions.Preprocessor()
+    stem = lambda term: shared.stem(term)
+    datasets = [DATASETS[name] for name in names]
+    if stopword_list is not None:
+        datasets = [dataset.with_stopwords(stopword_list) for dataset in datasets]
+    sweep_dataset = lambda dataset: run_dataset(dataset, stemming_modes, schemes=schemes, workers=workers, stem=stem,
+                                                results_cache=results_cache, cache_similarities=cache_similarities,
+                                                precision=precision, ingest_workers=ingest_workers)
+    if concurrent > 1:
+        with ThreadPoolExecutor(max_workers=concurrent) as executor:
+            batches = list(executor.map(sweep_dataset, datasets))
+    else:
+        batches = [sweep_dataset(dataset) for dataset in datasets]
+    # Only stems computed in this process; parallel ingest workers keep their own memos
+    info = shared.cache_info()
+    if info is not None:
+        instrument.count("stem cache hits", info.hits)
+        instrument.count("stem cache misses", info.misses)
+    return [result for batch in batches for result in batch]
+
+def report(results):
+    # Sort results by MAP score
+    results = sorted(results, reverse=True, key=lambda x: x[0])
+
+    # Output results
+    print("\nRanking of weighting schemes by MAP score:")
+    for score, scheme, dataset_name, stemming in results:
+        doc_scheme_str = ''.join(scheme[:3])
+        query_scheme_str = ''.join(scheme[3:])
+        print(f"{dataset_name.upper()} - {doc_scheme_str}.{query_scheme_str} ({stemming}): MAP Score = {score:.4f}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rank SMART weighting schemes by MAP on the bundled test collections")
+    parser.add_argument("--datasets", nargs="+", default=list(DATASETS), choices=list(DATASETS))
+    parser.add_argument("--stemming", default="both", choices=list(STEMMING_MODES))
+    parser.add_argument("--schemes", nargs="+", type=parse_scheme, help="document.query schemes such as ltc.nnn (default: all 128)")
+    parser.add_argument("--workers", type=int, default=1, help="worker processes for each weighting scheme sweep")
+    parser.add_argument("--concurrent", type=int, default=1, help="datasets to process at the same time")
+    parser.add_argument("--ingest-workers", type=int, default=1, help="processes that tokenize documents when an index is (re)built")
+    parser.add_argument("--stopwords", choices=list(stopwords.LISTS) + ["none"],
+                        help="use this bundled stopword list for every dataset instead of each dataset's own")
+    parser.add_argument("--precision", default="float64", choices=list(functions.PRECISIONS),
+                        help="precision of the unit vectors and similarities (see benchmarks/precision.py before lowering it)")
+    parser.add_argument("--cache-dir", default=cache.CACHE_ROOT, help="where MAP scores (and optionally similarity matrices) are cached")
+    parser.add_argument("--cache-budget", type=float, default=cache.DEFAULT_BUDGET / (1 << 20), help="cache size in MiB before LRU eviction")
+    parser.add_argument("--cache-similarities", action="store_true", help="also cache every similarity matrix, not just its MAP score")
+    parser.add_argument("--no-cache", action="store_true", help="recompute everything and leave the cache untouched")
+    parser.add_argument("--stats", help="write per-stage timings and counters to this JSON file")
+    parser.add_argument("--trace", help="write a Chrome trace (chrome://tracing, Perfetto) to this file")
+    parser.add_argument("--cprofile", metavar="DIR", help="write a cProfile dump per dataset into this directory")
+    parser.add_argument("--tracemalloc", action="store_true", help="add each dataset's peak Python allocation to --stats (slow)")
+    args = parser.parse_args(argv)
+    if args.tracemalloc and not args.stats:
+        parser.error("--tracemalloc needs --stats")
+    if args.stats or args.trace or args.cprofile:
+        instrument.enable(profile=bool(args.cprofile), memory=args.tracemalloc)
+    results_cache = None if args.no_cache else cache.ResultCache(args.cache_dir, int(args.cache_budget * (1 << 20)))
+    # None keeps each dataset's own list; an empty name turns stopword removal off
+    stopword_list = "" if args.stopwords == "none" else args.stopwords
+    report(run(args.datasets, STEMMING_MODES[args.stemming], schemes=args.schemes, workers=args.workers, concurrent=args.concurrent,
+               results_cache=results_cache, cache_similarities=args.cache_similarities and results_cache is not None,
+               stopword_list=stopword_list, precision=args.precision, ingest_workers=args.ingest_workers))
+    if instrument.enabled():
+        instrument.disable()
+        if args.stats:
+            instrument.write_json(args.stats)
+        if args.trace:
+            instrument.write_chrome_trace(args.trace)
+        if args.cprofile:
+            instrument.write_profiles(args.cprofile)
+
+if __name__ == "__main__":
+    main()
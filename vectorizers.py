@@ -0,0 +1,43 @@
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.metrics.pairwise import cosine_similarity
+
+import instrument
+from functions import analyze_tokens, apply_weighting
+
+def term_vectorizer(documents, **kwargs):
+    # Documents may be preprocessed strings or token lists; token lists skip sklearn's own re-tokenization
+    if documents and not isinstance(documents[0], str):
+        kwargs.setdefault("analyzer", analyze_tokens)
+    return TfidfVectorizer(**kwargs)
+
+class CustomTfidfVectorizer(TfidfVectorizer):
+    def __init__(self, tf_method='n', idf_method='t', normalization='c', **kwargs):
+        super().__init__(**kwargs)
+        self.tf_method = tf_method
+        self.idf_method = idf_method
+        self.normalization = normalization
+
+    @property
+    def scheme(self):
+        return (self.tf_method, self.idf_method, self.normalization)
+    
+    def fit_transform(self, raw_documents, y=None):
+        with instrument.stage("fit_transform", scheme=''.join(self.scheme)):
+            X = super().fit_transform(raw_documents)
+            return apply_weighting(X, self.idf_, self.scheme)
+    
+    def transform(self, raw_documents, copy=True):
+        with instrument.stage("transform", scheme=''.join(self.scheme)):
+            X = super().transform(raw_documents)
+            return apply_weighting(X, self.idf_, self.scheme)
+
+def compute_tfidf_and_similarity(documents, queries, doc_scheme, query_scheme):
+    doc_vectorizer = CustomTfidfVectorizer(tf_method=doc_scheme[0], idf_method=doc_scheme[1], normalization=doc_scheme[2])
+    doc_vectors = doc_vectorizer.fit_transform(documents)
+    
+    query_vectorizer = CustomTfidfVectorizer(tf_method=query_scheme[0], idf_method=query_scheme[1], normalization=query_scheme[2], vocabulary=doc_vectorizer.vocabulary_)
+    query_vectors = query_vectorizer.fit_transform(queries)
+    
+    with instrument.stage("cosine_similarity"):
+        similarities = cosine_similarity(query_vectors, doc_vectors)
+    return similarities